@@ -0,0 +1,8 @@
+"""
+Offline benchmarks for the scanner and crawler.
+
+Everything a scan normally reaches over the network is replaced by a local
+stand-in: subfinder by a replay of its JSON output, katana by a synthetic
+JSONL generator, DNS by a stub server and the probed hosts by a local aiohttp
+server. Run ``python -m benchmarks.run --help`` from the repository root.
+"""
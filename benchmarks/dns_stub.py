@@ -0,0 +1,123 @@
+"""
+Stub DNS server for offline scans.
+
+Answers A queries for a fixed set of hostnames with one address, after a
+configurable latency. A deterministic share of those hosts (by hash of the
+name, so every run agrees) answers NXDOMAIN instead, as do all names not in
+the set, which keeps wildcard detection from seeing wildcards. Other record
+types of known hosts get an empty NOERROR answer. Only the small subset of
+the wire format the scanner needs is implemented, so no DNS library is needed.
+
+Prints the bound UDP port on stdout once it is ready.
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import socket
+import struct
+import sys
+
+from benchmarks.fake_subfinder import load_records
+
+TYPE_A = 1
+CLASS_IN = 1
+RCODE_NXDOMAIN = 3
+
+
+def parse_question(packet: bytes):
+    """(query id, recursion desired, qname, qtype, end offset of the question)"""
+    query_id, flags, question_count = struct.unpack('!HHH', packet[:6])
+    if question_count != 1:
+        raise ValueError("Exactly one question is supported")
+    labels = []
+    offset = 12
+    while packet[offset]:
+        length = packet[offset]
+        labels.append(packet[offset + 1:offset + 1 + length].decode('ascii', errors='replace'))
+        offset += 1 + length
+    qtype, _ = struct.unpack('!HH', packet[offset + 1:offset + 5])
+    return query_id, flags & 0x0100, '.'.join(labels).lower(), qtype, offset + 5
+
+
+def build_response(packet: bytes, recursion: int, question_end: int, rcode: int = 0,
+                   address: str = None) -> bytes:
+    answers = 1 if address else 0
+    flags = 0x8000 | 0x0400 | recursion | 0x0080 | rcode  # response, authoritative, RD copied, RA
+    header = struct.pack('!HHHHHH', struct.unpack('!H', packet[:2])[0], flags, 1, answers, 0, 0)
+    response = header + packet[12:question_end]
+    if address:
+        # Name as a pointer to the question, then type, class, TTL and the address
+        response += struct.pack('!HHHIH', 0xC00C, TYPE_A, CLASS_IN, 60, 4) + socket.inet_aton(address)
+    return response
+
+
+def fails(name: str, nxdomain_ratio: float) -> bool:
+    digest = hashlib.blake2b(name.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2 ** 64 < nxdomain_ratio
+
+
+class StubDNSProtocol(asyncio.DatagramProtocol):
+    def __init__(self, hosts, address: str, latency: float, jitter: float, nxdomain_ratio: float):
+        self.hosts = hosts
+        self.address = address
+        self.latency = latency
+        self.jitter = jitter
+        self.nxdomain_ratio = nxdomain_ratio
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            _, recursion, name, qtype, question_end = parse_question(data)
+        except (ValueError, IndexError, struct.error):
+            return
+
+        if name not in self.hosts or fails(name, self.nxdomain_ratio):
+            response = build_response(data, recursion, question_end, rcode=RCODE_NXDOMAIN)
+        elif qtype == TYPE_A:
+            response = build_response(data, recursion, question_end, address=self.address)
+        else:
+            response = build_response(data, recursion, question_end)
+
+        delay = self.latency + random.uniform(0, self.jitter) if self.latency or self.jitter else 0
+        if delay:
+            asyncio.get_running_loop().call_later(delay, self.transport.sendto, response, addr)
+        else:
+            self.transport.sendto(response, addr)
+
+
+async def serve(args):
+    hosts = {record['host'].lower().rstrip('.') for record in load_records(args.hosts_file)}
+    hosts.update(args.host or [])
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: StubDNSProtocol(hosts, args.address, args.latency, args.jitter, args.nxdomain_ratio),
+        local_addr=(args.bind, args.port)
+    )
+    print(transport.get_extra_info('sockname')[1], flush=True)
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stub DNS server for offline benchmarks")
+    parser.add_argument('--hosts-file', required=True, help="subfinder JSON output whose hosts resolve")
+    parser.add_argument('--host', action='append', help="Extra hostname that resolves")
+    parser.add_argument('--address', default='127.0.0.1', help="Address every A answer carries")
+    parser.add_argument('--bind', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0, help="UDP port; 0 picks a free one")
+    parser.add_argument('--latency', type=float, default=0, help="Seconds before each answer")
+    parser.add_argument('--jitter', type=float, default=0, help="Extra random latency, up to this many seconds")
+    parser.add_argument('--nxdomain-ratio', type=float, default=0,
+                        help="Share of known hosts answered with NXDOMAIN")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Stand-in for the katana binary that emits synthetic crawl results.
+
+Accepts katana's command line and prints ``--results`` nested JSONL results
+for the ``-u`` URL at ``--rate`` lines per second, each carrying a response
+body of ``--body-size`` bytes. Paths repeat after ``--paths`` results and
+bodies after ``--distinct-bodies``, so deduplication and the blob store see
+realistic repetition; ``--script-every`` makes every n-th result a .js file.
+"""
+import argparse
+import json
+import sys
+import time
+
+
+def result_line(url: str, index: int, args) -> str:
+    path_index = index % args.paths
+    if args.script_every and path_index % args.script_every == 0:
+        endpoint = f"{url}/static/bundle{path_index}.js"
+        tag, content_type = 'script', 'application/javascript'
+    else:
+        endpoint = f"{url}/page/{path_index}?ref={index}"
+        tag, content_type = 'a', 'text/html'
+
+    marker = f"<!-- body {index % args.distinct_bodies} -->"
+    body = marker + 'x' * max(0, args.body_size - len(marker))
+    return json.dumps({
+        'timestamp': '2024-01-01T00:00:00Z',
+        'request': {
+            'method': 'GET',
+            'endpoint': endpoint,
+            'tag': tag,
+            'attribute': 'src' if tag == 'script' else 'href',
+            'source': url,
+        },
+        'response': {
+            'status_code': 200,
+            'headers': {'content_type': content_type},
+            'body': body,
+            'content_length': len(body),
+        },
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Emit synthetic katana JSONL results")
+    parser.add_argument('-u', dest='url', required=True, help="Target URL")
+    parser.add_argument('--results', type=int, default=1000, help="Results printed per crawl")
+    parser.add_argument('--rate', type=float, default=0,
+                        help="Results printed per second; 0 prints as fast as possible")
+    parser.add_argument('--body-size', type=int, default=4096, help="Bytes of each response body")
+    parser.add_argument('--paths', type=int, default=500, help="Distinct paths before they repeat")
+    parser.add_argument('--distinct-bodies', type=int, default=100, help="Distinct bodies before they repeat")
+    parser.add_argument('--script-every', type=int, default=10,
+                        help="Every n-th path is a script; 0 for none")
+    args, _ = parser.parse_known_args(argv)
+
+    url = args.url.rstrip('/')
+    start = time.monotonic()
+    out = sys.stdout
+    for index in range(args.results):
+        if args.rate:
+            delay = start + index / args.rate - time.monotonic()
+            if delay > 0:
+                out.flush()
+                time.sleep(delay)
+        out.write(result_line(url, index, args) + '\n')
+    out.flush()
+
+
+if __name__ == '__main__':
+    main()
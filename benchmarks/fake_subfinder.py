@@ -0,0 +1,63 @@
+"""
+Stand-in for the subfinder binary that replays recorded results.
+
+Accepts subfinder's command line (``-d``, ``-silent``, ``-json``,
+``-rate-limit``, ``-o``) and prints the records of a replay file, one JSON
+line each, the way ``subfinder -json`` does, copying them to ``-o`` if given. The replay file is subfinder's own JSON
+output, e.g. temp_results.json.
+"""
+import argparse
+import json
+import sys
+import time
+
+
+def load_records(path: str):
+    """Records of a JSONL replay file, or of a file holding one JSON array"""
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded subfinder results")
+    parser.add_argument('--replay', required=True, help="subfinder JSON output to replay")
+    parser.add_argument('--rate', type=float, default=0,
+                        help="Records printed per second; 0 prints as fast as possible")
+    parser.add_argument('--startup-delay', type=float, default=0,
+                        help="Seconds to wait before the first record, like a slow first source")
+    parser.add_argument('-d', dest='domain', help="Target domain; records of other domains are skipped")
+    parser.add_argument('-o', dest='output', help="File the printed records are also written to")
+    args, _ = parser.parse_known_args(argv)
+
+    records = load_records(args.replay)
+    if args.domain:
+        suffix = f".{args.domain}"
+        records = [record for record in records
+                   if record['host'] == args.domain or record['host'].endswith(suffix)]
+
+    time.sleep(args.startup_delay)
+    start = time.monotonic()
+    out = sys.stdout
+    copy = open(args.output, 'w') if args.output else None
+    try:
+        for index, record in enumerate(records):
+            if args.rate:
+                delay = start + index / args.rate - time.monotonic()
+                if delay > 0:
+                    out.flush()
+                    time.sleep(delay)
+            line = json.dumps(record) + '\n'
+            out.write(line)
+            if copy:
+                copy.write(line)
+        out.flush()
+    finally:
+        if copy:
+            copy.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Local HTTP server standing in for every probed host.
+
+Answers any path on any Host header with a fixed-size HTML body after a
+configurable latency. Prints the bound port on stdout once it is ready.
+"""
+import argparse
+import asyncio
+import random
+import sys
+
+from aiohttp import web
+
+
+def make_app(body_size: int, latency: float, jitter: float, status: int) -> web.Application:
+    body = ('<html><body>' + 'x' * max(0, body_size - 26) + '</body></html>').encode()
+
+    async def handle(request):
+        delay = latency + random.uniform(0, jitter) if latency or jitter else 0
+        if delay:
+            await asyncio.sleep(delay)
+        return web.Response(body=body, status=status, content_type='text/html')
+
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', handle)
+    return app
+
+
+async def serve(args):
+    runner = web.AppRunner(make_app(args.body_size, args.latency, args.jitter, args.status), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, args.bind, args.port)
+    await site.start()
+    print(runner.addresses[0][1], flush=True)
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP probe target for offline benchmarks")
+    parser.add_argument('--bind', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0, help="TCP port; 0 picks a free one")
+    parser.add_argument('--body-size', type=int, default=8192, help="Bytes of every response body")
+    parser.add_argument('--latency', type=float, default=0, help="Seconds before each response")
+    parser.add_argument('--jitter', type=float, default=0, help="Extra random latency, up to this many seconds")
+    parser.add_argument('--status', type=int, default=200, help="Status of every response")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
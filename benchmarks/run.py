@@ -0,0 +1,259 @@
+"""
+Run the offline benchmarks and report throughput, stage latency and peak memory.
+
+    python -m benchmarks.run scanner --replay temp_results.json --concurrency 200
+    python -m benchmarks.run katana --crawl-hosts 20 --results 2000 --body-size 20000
+    python -m benchmarks.run all --output report.json
+
+The scanner benchmark runs SubdomainScanner end to end against a replayed
+subfinder, the stub DNS server and the local HTTP target, with a fresh SQLite
+database. The katana benchmark streams synthetic results for a set of hosts
+through KatanaCrawler. Each benchmark runs in a fresh process, so its peak RSS
+is its own, and stage latencies come from the metrics registry.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shlex
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import aclosing
+from typing import Dict, List, Sequence, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCANNER_STAGES = ('subfinder', 'enqueue', 'dns_a', 'takeover', 'http_probe', 'validate', 'db_write')
+KATANA_STAGES = ('katana_crawl',)
+
+
+def write_wrapper(directory: str, name: str, module: str, arguments: Sequence[str]) -> str:
+    """Executable named name that runs a stand-in module with fixed arguments plus its own"""
+    path = os.path.join(directory, name)
+    command = ' '.join(shlex.quote(part) for part in (sys.executable, '-m', module, *arguments))
+    with open(path, 'w') as f:
+        f.write(f'#!/bin/sh\nPYTHONPATH={shlex.quote(ROOT)} exec {command} "$@"\n')
+    os.chmod(path, 0o755)
+    return path
+
+
+async def start_server(module: str, *arguments: str) -> Tuple[asyncio.subprocess.Process, int]:
+    """Start a stand-in server and wait for the port it prints once ready"""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, '-m', module, *arguments,
+        stdout=asyncio.subprocess.PIPE, cwd=ROOT
+    )
+    line = await asyncio.wait_for(process.stdout.readline(), timeout=30)
+    if not line:
+        await process.wait()
+        raise RuntimeError(f"{module} exited with status {process.returncode} before it was ready")
+    return process, int(line)
+
+
+async def stop_server(process: asyncio.subprocess.Process):
+    if process.returncode is None:
+        process.terminate()
+        await process.wait()
+
+
+def peak_rss() -> Dict[str, float]:
+    """Peak resident memory in MiB of this process and of its largest finished child"""
+    return {
+        'self_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'children_mb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def stage_latency(snapshot: Dict, stages: Sequence[str]) -> Dict[str, Dict[str, float]]:
+    return {
+        stage: {key: snapshot['stages'][stage][key] for key in ('count', 'p50', 'p99', 'max')}
+        for stage in stages if stage in snapshot['stages']
+    }
+
+
+async def benchmark_scanner(options: Dict) -> Dict:
+    from benchmarks.fake_subfinder import load_records
+    from subfinder.scanner import SubdomainScanner
+    from utils.database import db_manager
+    from utils.dns_cache import CachingResolver
+    from utils.http_client import HTTPProbeClient
+    from utils.metrics import metrics
+
+    replay = os.path.abspath(options['replay'])
+    records = load_records(replay)
+    target = options['target'] or records[0].get('input') or records[0]['host']
+
+    with tempfile.TemporaryDirectory(prefix='scanner-bench-') as directory:
+        write_wrapper(directory, 'subfinder', 'benchmarks.fake_subfinder',
+                      ['--replay', replay, '--rate', str(options['subfinder_rate'])])
+        os.environ['PATH'] = directory + os.pathsep + os.environ.get('PATH', '')
+
+        dns, dns_port = await start_server(
+            'benchmarks.dns_stub', '--hosts-file', replay,
+            '--latency', str(options['dns_latency']), '--jitter', str(options['dns_jitter']),
+            '--nxdomain-ratio', str(options['nxdomain_ratio'])
+        )
+        http, http_port = await start_server(
+            'benchmarks.http_target', '--latency', str(options['http_latency']),
+            '--body-size', str(options['http_body_size'])
+        )
+        try:
+            db_manager.database_url = f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}"
+            await db_manager.init()
+            metrics.reset()
+
+            resolver = CachingResolver(nameservers=['127.0.0.1'], udp_port=dns_port, tcp_port=dns_port,
+                                       timeout=2, tries=2)
+            http_client = HTTPProbeClient(resolver, limit=options['http_connections'],
+                                          port_overrides={80: http_port})
+            scanner = SubdomainScanner(
+                target,
+                concurrency=options['concurrency'],
+                resolver=resolver,
+                http_client=http_client,
+                resume=False,
+                output_file=os.path.join(directory, 'subfinder.json')
+            )
+            start = time.perf_counter()
+            try:
+                await scanner.run_scan()
+            finally:
+                elapsed = time.perf_counter() - start
+                await http_client.close()
+                await db_manager.close()
+        finally:
+            await stop_server(dns)
+            await stop_server(http)
+
+    snapshot = metrics.snapshot()
+    hosts = int(snapshot['counters'].get('hosts_validated', 0))
+    return {
+        'benchmark': 'scanner',
+        'target': target,
+        'records': len(records),
+        'hosts': hosts,
+        'elapsed_seconds': round(elapsed, 3),
+        'hosts_per_second': round(hosts / elapsed, 1) if elapsed else 0.0,
+        'counters': snapshot['counters'],
+        'stages': stage_latency(snapshot, SCANNER_STAGES),
+        'peak_rss': peak_rss(),
+    }
+
+
+async def benchmark_katana(options: Dict) -> Dict:
+    from katana.katana import KatanaCrawler
+    from utils.blob_store import BlobStore
+    from utils.metrics import metrics
+
+    with tempfile.TemporaryDirectory(prefix='katana-bench-') as directory:
+        katana_path = write_wrapper(directory, 'katana', 'benchmarks.fake_katana', [
+            '--results', str(options['results']), '--rate', str(options['katana_rate']),
+            '--body-size', str(options['body_size']), '--paths', str(options['paths']),
+        ])
+        blob_store = BlobStore(os.path.join(directory, 'blobs'))
+        crawler = KatanaCrawler(katana_path, blob_store=blob_store)
+        metrics.reset()
+
+        slots = asyncio.Semaphore(options['crawl_processes'])
+        results = 0
+
+        async def crawl(url: str):
+            nonlocal results
+            async with slots:
+                with metrics.timer('katana_crawl'):
+                    async with aclosing(crawler.stream_merged(url)) as stream:
+                        async for _ in stream:
+                            results += 1
+
+        hosts = [f"https://host{index}.bench.test" for index in range(options['crawl_hosts'])]
+        start = time.perf_counter()
+        await asyncio.gather(*(crawl(url) for url in hosts))
+        elapsed = time.perf_counter() - start
+
+    snapshot = metrics.snapshot()
+    return {
+        'benchmark': 'katana',
+        'hosts': len(hosts),
+        'results': results,
+        'elapsed_seconds': round(elapsed, 3),
+        'hosts_per_second': round(len(hosts) / elapsed, 2) if elapsed else 0.0,
+        'results_per_second': round(results / elapsed, 1) if elapsed else 0.0,
+        'blobs_stored': blob_store.stored,
+        'blobs_deduplicated': blob_store.deduplicated,
+        'stages': stage_latency(snapshot, KATANA_STAGES),
+        'peak_rss': peak_rss(),
+    }
+
+
+BENCHMARKS = {
+    'scanner': benchmark_scanner,
+    'katana': benchmark_katana,
+}
+
+
+def run_benchmark(name: str, options: Dict) -> Dict:
+    """Entry point of the process a benchmark runs in"""
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    logging.basicConfig(level=options['log_level'])
+    return asyncio.run(BENCHMARKS[name](options))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline scanner and crawler benchmarks")
+    parser.add_argument('benchmark', choices=[*BENCHMARKS, 'all'], help="Benchmark to run")
+    parser.add_argument('--output', help="Also write the JSON report to this file")
+    parser.add_argument('--log-level', default='WARNING', help="Log level inside the benchmark (default: WARNING)")
+
+    scanner = parser.add_argument_group('scanner')
+    scanner.add_argument('--replay', default=os.path.join(ROOT, 'temp_results.json'),
+                         help="subfinder JSON output replayed by the fake subfinder")
+    scanner.add_argument('--target', help="Apex domain to scan (default: the replay's input domain)")
+    scanner.add_argument('--concurrency', type=int, default=200, help="Validation workers")
+    scanner.add_argument('--http-connections', type=int, default=200, help="HTTP connection pool size")
+    scanner.add_argument('--subfinder-rate', type=float, default=0,
+                         help="Records the fake subfinder prints per second; 0 for unlimited")
+    scanner.add_argument('--dns-latency', type=float, default=0.01, help="Seconds before each DNS answer")
+    scanner.add_argument('--dns-jitter', type=float, default=0.02, help="Extra random DNS latency in seconds")
+    scanner.add_argument('--nxdomain-ratio', type=float, default=0.3,
+                         help="Share of replayed hosts that do not resolve")
+    scanner.add_argument('--http-latency', type=float, default=0.02, help="Seconds before each HTTP response")
+    scanner.add_argument('--http-body-size', type=int, default=8192, help="Bytes of each HTTP response body")
+
+    katana = parser.add_argument_group('katana')
+    katana.add_argument('--crawl-hosts', type=int, default=10, help="Hosts crawled")
+    katana.add_argument('--crawl-processes', type=int, default=4, help="Katana processes running at once")
+    katana.add_argument('--results', type=int, default=2000, help="Results the fake katana prints per host")
+    katana.add_argument('--katana-rate', type=float, default=0,
+                        help="Results printed per second per host; 0 for unlimited")
+    katana.add_argument('--body-size', type=int, default=16384, help="Bytes of each crawled response body")
+    katana.add_argument('--paths', type=int, default=500, help="Distinct paths per host")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> List[Dict]:
+    args = parse_args(argv)
+    options = vars(args)
+    names = list(BENCHMARKS) if args.benchmark == 'all' else [args.benchmark]
+
+    reports = []
+    context = multiprocessing.get_context('spawn')
+    for name in names:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            report = pool.submit(run_benchmark, name, options).result()
+        print(json.dumps(report, indent=2), flush=True)
+        reports.append(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+    return reports
+
+
+if __name__ == '__main__':
+    main()
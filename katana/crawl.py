@@ -0,0 +1,207 @@
+import asyncio
+import os
+import uuid
+from contextlib import aclosing
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from katana.endpoints import EndpointWriter
+from katana.js_analysis import JSAnalyzer
+from katana.katana import KatanaCrawler, KatanaResult
+from utils.database import db_manager
+from utils.logging_config import get_component_logger
+from utils.metrics import metrics
+from utils.seen_set import SeenSet
+
+# Seconds between memory checks
+MEMORY_POLL_INTERVAL = 1.0
+
+
+def process_rss(pid: int) -> int:
+    """Resident memory of a process in bytes, read from /proc; 0 if it is gone"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        pass
+    return 0
+
+
+class FleetCrawler:
+    """
+    Crawl every live subdomain of a scan with a bounded pool of katana processes.
+
+    Hosts are taken from the database (alive, with a usable HTTP status) and
+    crawled with one merged katana pass each. At most ``max_processes`` katana
+    processes run at once, each crawl is cut off after ``host_timeout``
+    seconds, and the resident memory of this process plus its katana children
+    is held under ``memory_limit``: above it no new crawl starts, and well
+    above it the largest katana process is killed. Results stream straight
+    into the endpoints table through an EndpointWriter, under whichever known
+    subdomain they belong to, deduplicated fleet-wide on
+    method and normalized path against a disk-backed seen-set. Script URLs
+    are also handed to a JSAnalyzer when one is given.
+    """
+
+    def __init__(self, crawler: Optional[KatanaCrawler] = None, max_processes: int = 4,
+                 host_timeout: float = 600, memory_limit: Optional[int] = 4 * 1024 ** 3,
+                 kill_ratio: float = 1.25, seen: Optional[SeenSet] = None,
+                 js_analyzer: Optional[JSAnalyzer] = None):
+        """
+        Args:
+            crawler: KatanaCrawler to run; one using katana from PATH is created when omitted
+            max_processes: Katana processes running at the same time
+            host_timeout: Seconds a single host may be crawled for
+            memory_limit: RSS in bytes across this process and katana (None disables the check)
+            kill_ratio: Multiple of memory_limit at which the largest katana process is killed
+            seen: Seen-set of endpoint keys, e.g. a persistent one shared between scans;
+                  a temporary one removed by close() is used when omitted
+            js_analyzer: Analyzer receiving every new on-host .js URL; scripts are not
+                         fetched when omitted
+        """
+        self.id = uuid.uuid4()
+        self.crawler = crawler or KatanaCrawler()
+        self.max_processes = max_processes
+        self.host_timeout = host_timeout
+        self.memory_limit = memory_limit
+        self.kill_ratio = kill_ratio
+        self.seen = seen if seen is not None else SeenSet()
+        self._owns_seen = seen is None
+        self.js_analyzer = js_analyzer
+        self.endpoints = EndpointWriter()
+        self.stats = self._new_stats()
+        self._memory_ok = asyncio.Event()
+        self._memory_ok.set()
+        self.logger = get_component_logger('crawl', instance_id=self.id)
+
+    async def run(self, apex: Optional[str] = None) -> Dict[str, int]:
+        """
+        Crawl the live hosts under apex (every live host when None).
+
+        Returns:
+            Counters for this crawl; the crawler may be reused for several apexes,
+            so they start from zero on every run
+        """
+        hosts = await db_manager.load_live_subdomains(apex)
+        await self.endpoints.load_index(apex)
+        self.stats = self._new_stats()
+        self.stats['hosts'] = len(hosts)
+        self.logger.info(f"Crawling {len(hosts)} live hosts with up to {self.max_processes} katana processes")
+        start_time = datetime.utcnow()
+
+        queue = asyncio.Queue()
+        for host in hosts:
+            queue.put_nowait(host)
+
+        if self.js_analyzer:
+            await self.js_analyzer.start()
+        workers = [asyncio.create_task(self._crawl_worker(queue)) for _ in range(self.max_processes)]
+        monitor = asyncio.create_task(self._watch_memory()) if self.memory_limit else None
+        queue_depth = queue.qsize
+        metrics.register_gauge('crawl_queue_depth', queue_depth)
+        try:
+            await asyncio.gather(*workers)
+            if self.js_analyzer:
+                await self.js_analyzer.join()
+            await db_manager.flush()
+        finally:
+            for task in workers + ([monitor] if monitor else []):
+                task.cancel()
+            await asyncio.gather(*workers, *([monitor] if monitor else []), return_exceptions=True)
+            metrics.unregister_gauge('crawl_queue_depth', queue_depth)
+
+        duration = (datetime.utcnow() - start_time).total_seconds()
+        self.logger.info(f"Fleet crawl completed in {duration:.2f} seconds: {self.stats}")
+        return self.stats
+
+    @staticmethod
+    def _new_stats() -> Dict[str, int]:
+        return {'hosts': 0, 'crawled': 0, 'failed': 0, 'timed_out': 0, 'endpoints': 0,
+                'cross_host': 0, 'duplicates': 0, 'off_host': 0, 'memory_kills': 0}
+
+    def close(self):
+        """Release the seen-set if this crawler created it"""
+        if self._owns_seen:
+            self.seen.close()
+
+    async def _crawl_worker(self, queue: asyncio.Queue):
+        while not queue.empty():
+            subdomain_id, domain, url = queue.get_nowait()
+            await self._memory_ok.wait()
+            await self.crawl_host(subdomain_id, domain, url or f"https://{domain}")
+
+    async def crawl_host(self, subdomain_id: int, domain: str, url: str):
+        """Crawl one host and buffer its endpoints; failures are logged and counted"""
+        self.logger.debug(f"Crawling {url}")
+        self.endpoints.index.setdefault(domain, subdomain_id)
+        try:
+            with metrics.timer('katana_crawl'):
+                async with asyncio.timeout(self.host_timeout):
+                    async with aclosing(self.crawler.stream_merged(url)) as results:
+                        async for result in results:
+                            await self._save_result(subdomain_id, domain, result)
+            self.stats['crawled'] += 1
+        except TimeoutError:
+            metrics.inc('katana_crawl_timeouts')
+            self.stats['timed_out'] += 1
+            self.logger.warning(f"Crawl of {url} timed out after {self.host_timeout} seconds")
+        except Exception as e:
+            self.stats['failed'] += 1
+            self.logger.error(f"Crawl of {url} failed: {str(e)}")
+
+    async def _save_result(self, subdomain_id: int, domain: str, result: KatanaResult):
+        location = self.endpoints.locate(result)
+        if location is None:
+            # Links to hosts outside the scan have no subdomain row to belong to
+            self.stats['off_host'] += 1
+            return
+
+        # Endpoints are stored per path, so query variants of one path are duplicates
+        if not self.seen.add(self.crawler.dedup_key(result, keep_query=False)):
+            self.stats['duplicates'] += 1
+            return
+
+        await self.endpoints.save(result, location)
+        self.stats['endpoints'] += 1
+        metrics.inc('katana_endpoints')
+        result_subdomain_id, path = location
+        if result_subdomain_id != subdomain_id:
+            self.stats['cross_host'] += 1
+
+        if self.js_analyzer and path.endswith('.js'):
+            await self.js_analyzer.submit(result_subdomain_id, result.url)
+
+    def memory_usage(self) -> Tuple[int, List[Tuple[int, asyncio.subprocess.Process]]]:
+        """Total RSS of this process and its katana children, and each child's (rss, process)"""
+        children = [(process_rss(process.pid), process) for process in self.crawler.processes]
+        return process_rss(os.getpid()) + sum(rss for rss, _ in children), children
+
+    async def _watch_memory(self):
+        if not os.path.exists(f'/proc/{os.getpid()}/status'):
+            self.logger.warning("Cannot read process memory from /proc, memory limit disabled")
+            return
+
+        while True:
+            total, children = self.memory_usage()
+            # With no katana running, one crawl is always allowed so the fleet
+            # can't stall on memory this process alone is holding
+            if total >= self.memory_limit and children:
+                if self._memory_ok.is_set():
+                    self.logger.warning(
+                        f"Crawl memory at {total // 2 ** 20} MiB, over the {self.memory_limit // 2 ** 20} MiB "
+                        f"limit; holding new crawls"
+                    )
+                self._memory_ok.clear()
+            else:
+                self._memory_ok.set()
+
+            if total >= self.memory_limit * self.kill_ratio and children:
+                rss, process = max(children, key=lambda child: child[0])
+                if process.returncode is None:
+                    self.logger.warning(f"Killing katana process {process.pid} using {rss // 2 ** 20} MiB")
+                    process.kill()
+                    self.stats['memory_kills'] += 1
+
+            await asyncio.sleep(MEMORY_POLL_INTERVAL)
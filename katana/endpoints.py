@@ -0,0 +1,90 @@
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from katana.katana import KatanaResult
+from models.models import EndpointSource
+from utils.database import db_manager
+from utils.logging_config import get_component_logger
+from utils.urls import normalize_url
+
+
+def endpoint_source(source: str) -> EndpointSource:
+    """EndpointSource for a KatanaResult source tag; unknown tags count as plain crawling"""
+    try:
+        return EndpointSource(source)
+    except ValueError:
+        pass
+    try:
+        return EndpointSource[source.upper()]
+    except KeyError:
+        return EndpointSource.CRAWL
+
+
+class EndpointWriter:
+    """
+    Persist KatanaResults as Endpoint rows.
+
+    Each result's host is looked up in an in-memory host -> subdomain_id index
+    loaded with one query per scan, never with a query per row. Rows are
+    buffered by db_manager and written as batched upserts on
+    (subdomain_id, path, method), so a crawl that finds an endpoint again only
+    refreshes its response details.
+    """
+
+    def __init__(self, index: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            index: Host to subdomain_id mapping to start from; load_index() replaces it
+        """
+        self.index: Dict[str, int] = dict(index or {})
+        self.logger = get_component_logger('endpoints')
+
+    async def load_index(self, apex: Optional[str] = None):
+        """Load the subdomain ids of every stored host under apex (all hosts when None)"""
+        self.index = await db_manager.load_subdomain_index(apex)
+        self.logger.debug(f"Loaded {len(self.index)} hosts into the endpoint index")
+
+    def locate(self, result: KatanaResult) -> Optional[Tuple[int, str]]:
+        """(subdomain_id, normalized path) of a result, or None if its host is not a known subdomain"""
+        parts = urlsplit(normalize_url(result.url, keep_query=False))
+        subdomain_id = self.index.get(parts.hostname) if parts.hostname else None
+        if subdomain_id is None:
+            return None
+        return subdomain_id, parts.path
+
+    async def save(self, result: KatanaResult, location: Optional[Tuple[int, str]] = None) -> bool:
+        """
+        Buffer the Endpoint row for a result.
+
+        Args:
+            location: Result of locate() when the caller already has it
+
+        Returns:
+            False if the result's host is not a known subdomain and nothing was saved
+        """
+        location = location or self.locate(result)
+        if location is None:
+            return False
+        subdomain_id, path = location
+        await db_manager.save_endpoint(self.endpoint_row(result, subdomain_id, path))
+        return True
+
+    @staticmethod
+    def endpoint_row(result: KatanaResult, subdomain_id: int, path: str) -> dict:
+        """Map a KatanaResult onto Endpoint columns"""
+        return {
+            'subdomain_id': subdomain_id,
+            'path': path,
+            'method': result.method.upper(),
+            'source': endpoint_source(result.source),
+            'discovery_time': datetime.utcnow(),
+            'content_type': result.content_type,
+            'status_code': result.status_code,
+            'response_size': result.response_size,
+            'body_hash': result.body_hash,
+            'body_size': result.body_size,
+            'parameters': result.parameters,
+            'is_authenticated': False,
+            'additional_info': {'url': result.url},
+        }
@@ -0,0 +1,250 @@
+import asyncio
+import hashlib
+import multiprocessing
+import re
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+import aiohttp
+
+from utils.database import db_manager
+from utils.http_client import HTTPProbeClient
+from utils.logging_config import get_component_logger
+
+# Scripts larger than this are analyzed from their first bytes only
+DEFAULT_MAX_SCRIPT_BYTES = 5 * 1024 * 1024
+
+# Cap on the matches kept per pattern and file, so minified data blobs can't flood a row
+MAX_MATCHES = 500
+
+# Compiled once per worker process at import, then reused for every script
+ENDPOINT_PATTERNS = (
+    # Absolute URLs in string literals
+    re.compile(r'''["'`]((?:https?:)?//[a-z0-9][a-z0-9.-]*\.[a-z]{2,}(?::\d+)?(?:/[^"'`\s<>\\]*)?)["'`]''',
+               re.IGNORECASE),
+    # Root-relative API-looking paths
+    re.compile(r'''["'`](/(?:api|graphql|rest|services?|v\d+|internal|admin|auth|oauth2?)(?:[/?][^"'`\s<>\\]*)?)["'`]''',
+               re.IGNORECASE),
+    # Root-relative paths to server-side handlers or data files
+    re.compile(r'''["'`](/[\w\-./]+\.(?:json|xml|php|aspx?|jsp|action|do|cgi)(?:\?[^"'`\s<>\\]*)?)["'`]''',
+               re.IGNORECASE),
+)
+
+SECRET_PATTERNS = {
+    'aws_access_key_id': re.compile(r'\b((?:AKIA|ASIA)[0-9A-Z]{16})\b'),
+    'google_api_key': re.compile(r'\b(AIza[0-9A-Za-z_\-]{35})\b'),
+    'github_token': re.compile(r'\b(gh[pousr]_[0-9A-Za-z]{36,})\b'),
+    'slack_token': re.compile(r'\b(xox[abposr]-[0-9A-Za-z\-]{10,})\b'),
+    'stripe_key': re.compile(r'\b((?:sk|rk)_live_[0-9A-Za-z]{16,})\b'),
+    'jwt': re.compile(r'\b(eyJ[\w\-]{10,}\.eyJ[\w\-]{10,}\.[\w\-]{10,})\b'),
+    'private_key': re.compile(r'(-----BEGIN (?:RSA |EC |DSA |OPENSSH )?PRIVATE KEY-----)'),
+}
+
+# Config-style assignments such as apiKey: "..." or CLIENT_SECRET = '...'
+ASSIGNMENT_PATTERN = re.compile(
+    r'''\b([\w$]*(?:api_?key|secret|token|passw(?:or)?d|client_?id|access_?key|auth)[\w$]*)["']?\s*[:=]\s*["'`]([^"'`\s]{8,200})["'`]''',
+    re.IGNORECASE
+)
+
+
+def analyze_source(source: str) -> Tuple[List[str], Dict[str, List[str]]]:
+    """
+    Extract referenced endpoints and interesting variables from script source.
+
+    Runs in a worker process, so it only touches module-level state.
+
+    Returns:
+        (sorted endpoints, mapping of variable or secret kind to its sorted values)
+    """
+    endpoints = set()
+    for pattern in ENDPOINT_PATTERNS:
+        for match in pattern.finditer(source):
+            endpoints.add(match.group(1))
+            if len(endpoints) >= MAX_MATCHES * len(ENDPOINT_PATTERNS):
+                break
+
+    variables: Dict[str, Set[str]] = {}
+    for kind, pattern in SECRET_PATTERNS.items():
+        for match in pattern.finditer(source):
+            values = variables.setdefault(kind, set())
+            values.add(match.group(1))
+            if len(values) >= MAX_MATCHES:
+                break
+    for match in ASSIGNMENT_PATTERN.finditer(source):
+        values = variables.setdefault(match.group(1), set())
+        if len(values) < MAX_MATCHES:
+            values.add(match.group(2))
+
+    return sorted(endpoints), {name: sorted(values) for name, values in variables.items()}
+
+
+class JSAnalyzer:
+    """
+    Fetch JavaScript files found while crawling and record what they reference.
+
+    Every script is downloaded and hashed, but analyzed only once per distinct
+    hash: a vendor bundle served by many hosts, or already analyzed by an
+    earlier scan, reuses the stored result. New scripts are scanned with the
+    precompiled endpoint and secret patterns in a process pool, keeping regex
+    work off the event loop. One javascript_files row is written per host and
+    script URL through db_manager.
+    """
+
+    def __init__(self, http_client: Optional[HTTPProbeClient] = None, concurrency: int = 20,
+                 processes: Optional[int] = None, max_script_bytes: int = DEFAULT_MAX_SCRIPT_BYTES):
+        """
+        Args:
+            http_client: Client used to download scripts; a private one is created and
+                         closed by close() when omitted
+            concurrency: Scripts downloaded at the same time
+            processes: Analysis worker processes (default: one per CPU)
+            max_script_bytes: Bytes of each script downloaded and analyzed
+        """
+        self.id = uuid.uuid4()
+        self._owns_http_client = http_client is None
+        self.http_client = http_client or HTTPProbeClient()
+        self.concurrency = concurrency
+        self.processes = processes
+        self.max_script_bytes = max_script_bytes
+        self.stats = {'scripts': 0, 'analyzed': 0, 'reused': 0, 'failed': 0}
+        # file_hash -> (endpoints, variables) for scripts seen in this run
+        self.analyses: Dict[str, Tuple[List[str], Dict[str, List[str]]]] = {}
+        self._analyzing: Dict[str, asyncio.Future] = {}
+        self._known_hashes: Optional[Set[str]] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.logger = get_component_logger('js_analysis', instance_id=self.id)
+
+    async def start(self):
+        """Load the hashes analyzed by earlier scans and start the download workers"""
+        if self._workers:
+            return
+        # One analyzer serves the crawls of several targets; each reports its own counts
+        self.stats = dict.fromkeys(self.stats, 0)
+        if self._known_hashes is None:
+            self._known_hashes = await db_manager.load_javascript_hashes()
+            self.logger.debug(f"{len(self._known_hashes)} scripts already analyzed")
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'))
+        self._queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def submit(self, subdomain_id: int, url: str):
+        """Queue a script for analysis; waits while the download queue is full"""
+        await self._queue.put((subdomain_id, url))
+
+    async def join(self):
+        """Wait for every submitted script and stop the workers"""
+        await self._queue.join()
+        await self._stop_workers()
+        self.logger.info(f"JavaScript analysis finished: {self.stats}")
+
+    async def close(self):
+        await self._stop_workers()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        if self._owns_http_client:
+            await self.http_client.close()
+
+    async def analyze(self, subdomain_id: int, url: str):
+        """Download, hash and analyze one script, then buffer its row; failures are logged and counted"""
+        self.stats['scripts'] += 1
+        try:
+            response = await self.http_client.probe(url, max_body_bytes=self.max_script_bytes)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.stats['failed'] += 1
+            self.logger.debug(f"Could not fetch {url}: {str(e)}")
+            return
+        if response.status != 200:
+            self.stats['failed'] += 1
+            self.logger.debug(f"Skipping {url}: HTTP {response.status}")
+            return
+
+        file_hash = hashlib.sha256(response.body_prefix).hexdigest()
+        try:
+            endpoints, variables = await self._analysis(file_hash, response.text())
+        except Exception as e:
+            self.stats['failed'] += 1
+            self.logger.error(f"Analysis of {url} failed: {str(e)}")
+            return
+
+        await db_manager.save_javascript({
+            'subdomain_id': subdomain_id,
+            'url': url,
+            'file_hash': file_hash,
+            'endpoints_referenced': endpoints,
+            'variables': variables,
+            'discovery_time': datetime.utcnow(),
+            'last_modified': self._last_modified(response.headers),
+        })
+
+    async def _analysis(self, file_hash: str, source: str) -> Tuple[List[str], Dict[str, List[str]]]:
+        """Result for a script's hash, running the patterns only for hashes never analyzed"""
+        if file_hash in self.analyses:
+            self.stats['reused'] += 1
+            return self.analyses[file_hash]
+
+        # Concurrent downloads of the same bundle wait for one analysis
+        pending = self._analyzing.get(file_hash)
+        if pending is not None:
+            self.stats['reused'] += 1
+            return await asyncio.shield(pending)
+
+        pending = asyncio.get_running_loop().create_future()
+        self._analyzing[file_hash] = pending
+        try:
+            stored = None
+            if file_hash in self._known_hashes:
+                stored = await db_manager.load_javascript_analysis(file_hash)
+            if stored is not None:
+                self.stats['reused'] += 1
+                analysis = stored
+            else:
+                loop = asyncio.get_running_loop()
+                analysis = await loop.run_in_executor(self._pool, analyze_source, source)
+                self.stats['analyzed'] += 1
+            self.analyses[file_hash] = analysis
+            pending.set_result(analysis)
+            return analysis
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            # Nobody else may be waiting; don't leave "exception never retrieved" behind
+            pending.exception()
+            raise
+        finally:
+            del self._analyzing[file_hash]
+
+    async def _worker(self):
+        while True:
+            subdomain_id, url = await self._queue.get()
+            try:
+                await self.analyze(subdomain_id, url)
+            finally:
+                self._queue.task_done()
+
+    async def _stop_workers(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    @staticmethod
+    def _last_modified(headers: Dict[str, str]) -> Optional[datetime]:
+        value = headers.get('Last-Modified')
+        if not value:
+            return None
+        try:
+            modified = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if modified.tzinfo is not None:
+            modified = modified.astimezone(timezone.utc).replace(tzinfo=None)
+        return modified
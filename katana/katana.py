@@ -1,11 +1,19 @@
 import asyncio
-from dataclasses import dataclass
+from contextlib import aclosing
+from dataclasses import dataclass, field
 import json
-from typing import List, Dict, Optional, Set
+from typing import AsyncIterator, List, Dict, Optional, Sequence, Set, Tuple
 from urllib.parse import urlparse
 import logging
+import shutil
 from pathlib import Path
 
+from models.models import EndpointSource
+from utils.blob_store import BlobStore
+from utils.process import stop_process
+from utils.seen_set import SeenSet
+from utils.urls import normalize_url
+
 @dataclass
 class KatanaResult:
     url: str
@@ -15,65 +23,181 @@ class KatanaResult:
     response_size: Optional[int]
     parameters: Dict
     headers: Dict
-    response_body: Optional[str]
     source: str
+    body_hash: Optional[str] = None  # Key of the response body in the blob store
+    body_size: Optional[int] = None
+    blob_store: Optional[BlobStore] = field(default=None, repr=False, compare=False)
+
+    @property
+    def response_body(self) -> Optional[str]:
+        """Response text, loaded from the blob store only when asked for"""
+        if self.body_hash is None or self.blob_store is None:
+            return None
+        return self.blob_store.get_text(self.body_hash)
 
 class KatanaCrawler:
-    def __init__(self, katana_path: str = "katana"):
+    # Crawl modes: result source tag and mode-specific katana flags
+    CRAWL_MODES = {
+        "endpoints": ("crawler", ["-d", "3", "-rl", "150", "-c", "10", "-xhr"]),
+        "js": ("javascript_parser", ["-jc", "-jsl", "-d", "4"]),
+        "forms": ("form_submission", ["-aff", "-fx", "-d", "3"]),
+    }
+
+    # Union of the mode flags above for a single pass that does all three jobs;
+    # the depth is the deepest of the modes
+    MERGED_FLAGS = ["-d", "4", "-rl", "150", "-c", "10", "-xhr", "-jc", "-jsl", "-aff", "-fx"]
+
+    # Request tags katana reports for links found by its JavaScript parsers
+    JS_TAGS = {"script", "js", "jsluice"}
+
+    # Stdout read buffer per katana process; reading pauses once ~2x this is queued
+    READ_BUFFER_SIZE = 1024 * 1024
+
+    # Largest single JSONL line accepted from katana (lines carry response bodies)
+    MAX_LINE_SIZE = 32 * 1024 * 1024
+
+    # Bodies larger than this are hashed, compressed and written off the event loop
+    BLOB_OFFLOAD_SIZE = 64 * 1024
+
+    def __init__(self, katana_path: str = "katana", max_pending: int = 100,
+                 blob_store: Optional[BlobStore] = None, template_paths: bool = False):
         """
         Initialize Katana crawler with path to binary and logger
+
+        Args:
+            katana_path: Path to katana binary
+            max_pending: Parsed results buffered before katana output reads are paused
+            blob_store: Where response bodies are kept; results only carry their hash.
+                        A store under ./blobs is used when omitted
+            template_paths: Treat numeric, UUID and hex path segments and query values as
+                            placeholders when deduplicating, so /item/1 and /item/2 count once
         """
         self.katana_path = katana_path
+        self.max_pending = max_pending
+        self.blob_store = blob_store or BlobStore()
+        self.template_paths = template_paths
+        self.processes: Set[asyncio.subprocess.Process] = set()  # katana processes still running
         self.logger = logging.getLogger(__name__)
         self._validate_installation()
 
     def _validate_installation(self):
         """Validate katana installation"""
-        katana_path = Path(self.katana_path)
-        if not katana_path.exists():
+        # Accept both a path to the binary and a bare name found on PATH
+        if not Path(self.katana_path).exists() and shutil.which(self.katana_path) is None:
             self.logger.error(f"Katana binary not found at {self.katana_path}")
             raise FileNotFoundError(f"Katana binary not found at {self.katana_path}")
 
-    async def crawl_all(self, target_url: str) -> List[KatanaResult]:
+    async def crawl_all(self, target_url: str, merged: bool = True) -> List[KatanaResult]:
         """
-        Perform all types of crawling concurrently and return combined results
+        Perform all types of crawling and return combined results
+
+        Args:
+            target_url: URL to crawl
+            merged: Crawl once with the union of all mode flags instead of running
+                    one katana process per mode
         """
         self.logger.info(f"Starting comprehensive crawl of {target_url}")
-        
-        tasks = [
-            self.crawl_endpoints(target_url),
-            self.crawl_js(target_url),
-            self.crawl_forms(target_url)
-        ]
-        
-        results = []
-        for completed_task in await asyncio.gather(*tasks, return_exceptions=True):
-            if isinstance(completed_task, Exception):
-                self.logger.error(f"Crawl task failed: {str(completed_task)}")
-                continue
-            results.extend(completed_task)
-        
-        self.logger.info(f"Comprehensive crawl completed. Found {len(results)} unique endpoints")
-        return self._deduplicate_results(results)
+
+        stream = self.stream_merged(target_url) if merged else self.crawl_stream(target_url)
+        results = [result async for result in stream]
+        unique_results = self._deduplicate_results(results)
+
+        self.logger.info(f"Comprehensive crawl completed. Found {len(unique_results)} unique endpoints")
+        return unique_results
+
+    async def crawl_stream(self, target_url: str,
+                           modes: Sequence[str] = ("endpoints", "js", "forms")) -> AsyncIterator[KatanaResult]:
+        """
+        Run the requested crawl modes concurrently and yield results as katana emits them.
+
+        Results from all modes pass through a bounded queue. When the consumer falls
+        behind, the queue fills, the mode readers stop reading stdout and katana
+        itself blocks on its output pipe.
+        """
+        queue = asyncio.Queue(maxsize=self.max_pending)
+        done = object()
+
+        async def produce(mode: str):
+            try:
+                async with aclosing(self.stream_mode(target_url, mode)) as results:
+                    async for result in results:
+                        await queue.put(result)
+            except Exception as e:
+                self.logger.error(f"Crawl task failed: {str(e)}")
+            await queue.put(done)
+
+        producers = [asyncio.create_task(produce(mode)) for mode in modes]
+        remaining = len(producers)
+
+        try:
+            while remaining:
+                item = await queue.get()
+                if item is done:
+                    remaining -= 1
+                    continue
+                yield item
+        finally:
+            for producer in producers:
+                producer.cancel()
+            await asyncio.gather(*producers, return_exceptions=True)
+
+    async def stream_mode(self, target_url: str, mode: str) -> AsyncIterator[KatanaResult]:
+        """
+        Run a single crawl mode and yield each result as soon as it is parsed
+        """
+        source, flags = self.CRAWL_MODES[mode]
+        cmd = [self.katana_path, "-u", target_url, *flags, "-j", "-silent"]
+
+        async with aclosing(self._stream_command(cmd)) as raw_results:
+            async for raw in raw_results:
+                yield await self._parse_result(raw, source)
+
+    async def stream_merged(self, target_url: str) -> AsyncIterator[KatanaResult]:
+        """
+        Run one katana process with the flags of every crawl mode and yield its results.
+
+        Each page is fetched once instead of once per mode. Results are tagged
+        with the EndpointSource of the mode that would have found them, judged
+        from the request katana reports.
+        """
+        cmd = [self.katana_path, "-u", target_url, *self.MERGED_FLAGS, "-j", "-silent"]
+
+        # Closing this stream early closes the command stream too, which kills katana
+        async with aclosing(self._stream_command(cmd)) as raw_results:
+            async for raw in raw_results:
+                yield await self._parse_result(raw, self._classify_source(raw))
+
+    def _classify_source(self, result: Dict) -> str:
+        """Pick the EndpointSource value for a result of a merged crawl"""
+        request = self._request_fields(result)
+        method = (request.get('method') or 'GET').upper()
+        tag = (request.get('tag') or '').lower()
+        attribute = (request.get('attribute') or '').lower()
+
+        if method != 'GET' or tag == 'form' or attribute == 'action' or result.get('form_data'):
+            return EndpointSource.FORM.value
+
+        url = request.get('endpoint') or result.get('url', '')
+        referrer = request.get('source') or ''
+        if (tag in self.JS_TAGS
+                or urlparse(url).path.endswith('.js')
+                or urlparse(referrer).path.endswith('.js')):
+            return EndpointSource.JS_PARSE.value
+
+        return EndpointSource.CRAWL.value
+
+    @staticmethod
+    def _request_fields(result: Dict) -> Dict:
+        """Request details from katana's nested JSON, or the flat legacy result itself"""
+        request = result.get('request')
+        return request if isinstance(request, dict) else result
 
     async def crawl_endpoints(self, target_url: str) -> List[KatanaResult]:
         """
         Standard crawl optimized for endpoint discovery
         """
         self.logger.debug(f"Starting endpoint crawl for {target_url}")
-        cmd = [
-            self.katana_path,
-            "-u", target_url,
-            "-d", "3",
-            "-rl", "150",
-            "-c", "10",
-            "-j",
-            "-silent",
-            "-xhr"
-        ]
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "crawler") for r in results]
+        processed_results = [r async for r in self.stream_mode(target_url, "endpoints")]
         self.logger.debug(f"Endpoint crawl completed. Found {len(processed_results)} results")
         return processed_results
 
@@ -82,18 +206,7 @@ class KatanaCrawler:
         JavaScript-focused crawl
         """
         self.logger.debug(f"Starting JavaScript crawl for {target_url}")
-        cmd = [
-            self.katana_path,
-            "-u", target_url,
-            "-jc",
-            "-jsl",
-            "-d", "4",
-            "-j",
-            "-silent"
-        ]
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "javascript_parser") for r in results]
+        processed_results = [r async for r in self.stream_mode(target_url, "js")]
         self.logger.debug(f"JavaScript crawl completed. Found {len(processed_results)} results")
         return processed_results
 
@@ -102,18 +215,7 @@ class KatanaCrawler:
         Form-focused crawl
         """
         self.logger.debug(f"Starting form crawl for {target_url}")
-        cmd = [
-            self.katana_path,
-            "-u", target_url,
-            "-aff",
-            "-fx",
-            "-d", "3",
-            "-j",
-            "-silent"
-        ]
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "form_submission") for r in results]
+        processed_results = [r async for r in self.stream_mode(target_url, "forms")]
         self.logger.debug(f"Form crawl completed. Found {len(processed_results)} results")
         return processed_results
 
@@ -143,75 +245,186 @@ class KatanaCrawler:
                     cmd.extend([flag_mapping[key], str(value)])
         
         results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "custom") for r in results]
+        processed_results = [await self._parse_result(r, "custom") for r in results]
         self.logger.debug(f"Custom crawl completed. Found {len(processed_results)} results")
         return processed_results
 
     async def _execute_command(self, cmd: List[str]) -> List[Dict]:
         """Execute katana command asynchronously and return parsed JSON results"""
+        return [result async for result in self._stream_command(cmd)]
+
+    async def _stream_command(self, cmd: List[str]) -> AsyncIterator[Dict]:
+        """
+        Execute katana command asynchronously and yield each JSON result as its line arrives.
+
+        Stdout is only read when the consumer asks for the next result and the read
+        buffer is kept small, so a slow consumer throttles katana through the pipe
+        instead of buffering in memory. Lines longer than the buffer are assembled
+        in chunks; lines over MAX_LINE_SIZE are skipped. The process is killed if
+        the consumer stops early.
+        """
+        self.logger.debug(f"Executing command: {' '.join(cmd)}")
         try:
-            self.logger.debug(f"Executing command: {' '.join(cmd)}")
             process = await asyncio.create_subprocess_exec(
                 *cmd,
                 stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+                stderr=asyncio.subprocess.PIPE,
+                limit=self.READ_BUFFER_SIZE
             )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                error_msg = stderr.decode()
-                self.logger.error(f"Katana command failed: {error_msg}")
-                raise RuntimeError(f"Katana command failed: {error_msg}")
-            
-            results = []
-            for line in stdout.decode().splitlines():
+        except Exception as e:
+            self.logger.error(f"Error executing katana: {str(e)}")
+            raise
+
+        self.processes.add(process)
+        stderr_task = asyncio.create_task(process.stderr.read())
+
+        try:
+            while True:
+                line = await self._read_line(process.stdout)
+                if line is None:
+                    break
+                if not line.strip():
+                    continue
                 try:
-                    if line.strip():
-                        result = json.loads(line)
-                        results.append(result)
+                    yield json.loads(line)
                 except json.JSONDecodeError as e:
                     self.logger.warning(f"Failed to parse JSON line: {e}")
                     continue
-                    
-            return results
-            
+
+            await process.wait()
+            stderr = await stderr_task
+
+            if process.returncode != 0:
+                error_msg = stderr.decode()
+                self.logger.error(f"Katana command failed: {error_msg}")
+                raise RuntimeError(f"Katana command failed: {error_msg}")
+
         except Exception as e:
             self.logger.error(f"Error executing katana: {str(e)}")
             raise
+        finally:
+            await stop_process(process, stderr_task)
+            self.processes.discard(process)
+
+    async def _read_line(self, stream: asyncio.StreamReader) -> Optional[bytes]:
+        """
+        Read one line of any length without raising the stream's buffer limit.
+
+        Returns None at EOF and an empty line for lines over MAX_LINE_SIZE,
+        which are consumed and discarded.
+        """
+        chunks = []
+        size = 0
+        oversized = False
+
+        while True:
+            try:
+                chunk = await stream.readuntil(b'\n')
+                done = True
+            except asyncio.IncompleteReadError as e:
+                chunk = e.partial
+                done = True
+                if not chunk and not chunks and not oversized:
+                    return None
+            except asyncio.LimitOverrunError as e:
+                chunk = await stream.readexactly(e.consumed)
+                done = False
+
+            size += len(chunk)
+            if size > self.MAX_LINE_SIZE:
+                oversized = True
+                chunks = []
+            elif not oversized:
+                chunks.append(chunk)
+
+            if done:
+                break
+
+        if oversized:
+            self.logger.warning(f"Skipping katana result line of {size} bytes (limit {self.MAX_LINE_SIZE})")
+            return b''
+        return b''.join(chunks)
 
-    def _parse_result(self, result: Dict, source: str) -> KatanaResult:
+    async def _parse_result(self, result: Dict, source: str) -> KatanaResult:
         """Convert raw katana result to KatanaResult object"""
         try:
-            parsed_url = urlparse(result.get('url', ''))
-            
+            request = self._request_fields(result)
+            response = result.get('response')
+            if isinstance(response, dict):
+                # Current katana nests request and response details
+                headers = response.get('headers', {})
+                status_code = response.get('status_code')
+                content_type = headers.get('content_type') or headers.get('Content-Type')
+                response_size = response.get('content_length')
+                response_body = response.get('body')
+            else:
+                headers = result.get('headers', {})
+                status_code = result.get('status-code')
+                content_type = result.get('content-type')
+                response_size = result.get('response-size')
+                response_body = response
+
+            url = request.get('endpoint') or result.get('url', '')
+            parsed_url = urlparse(url)
+
+            # The body goes to the blob store straight away so results stay small
+            body_hash = body_size = None
+            if response_body:
+                body_hash, body_size = await self._store_body(response_body)
+
             return KatanaResult(
-                url=result.get('url', ''),
-                method=result.get('method', 'GET'),
-                status_code=result.get('status-code'),
-                content_type=result.get('content-type'),
-                response_size=result.get('response-size'),
+                url=url,
+                method=request.get('method') or 'GET',
+                status_code=status_code,
+                content_type=content_type,
+                response_size=response_size,
                 parameters={
                     'query': parsed_url.query,
                     'form_data': result.get('form_data', {})
                 },
-                headers=result.get('headers', {}),
-                response_body=result.get('response', None),
-                source=source
+                headers=headers,
+                source=source,
+                body_hash=body_hash,
+                body_size=body_size,
+                blob_store=self.blob_store
             )
         except Exception as e:
             self.logger.error(f"Error parsing result: {str(e)}")
             raise
 
-    def _deduplicate_results(self, results: List[KatanaResult]) -> List[KatanaResult]:
-        """Remove duplicate results based on URL and method"""
-        seen = set()
+    async def _store_body(self, body: str) -> Tuple[str, int]:
+        """Put a body in the blob store, in a worker thread unless it is small"""
+        if len(body) <= self.BLOB_OFFLOAD_SIZE:
+            return self.blob_store.put(body)
+        # Hashing, compressing and writing megabytes here would stall every other
+        # katana stream, download and database flush sharing the loop
+        return await asyncio.get_running_loop().run_in_executor(None, self.blob_store.put, body)
+
+    def dedup_key(self, result: KatanaResult, keep_query: bool = True) -> str:
+        """Key identifying a result's endpoint: method plus normalized URL"""
+        return f"{result.method} {normalize_url(result.url, self.template_paths, keep_query)}"
+
+    def _deduplicate_results(self, results: List[KatanaResult],
+                             seen: Optional[SeenSet] = None) -> List[KatanaResult]:
+        """
+        Remove duplicate results based on normalized URL and method
+
+        Args:
+            results: Results in crawl order; the first of each endpoint is kept
+            seen: Seen-set shared across crawls; a set local to this call when omitted
+        """
+        local_seen = set()
         unique_results = []
         
         for result in results:
-            key = (result.url, result.method)
-            if key not in seen:
-                seen.add(key)
-                unique_results.append(result)
+            key = self.dedup_key(result)
+            if seen is not None:
+                if not seen.add(key):
+                    continue
+            elif key in local_seen:
+                continue
+            else:
+                local_seen.add(key)
+            unique_results.append(result)
         
         return unique_results
\ No newline at end of file
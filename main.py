@@ -1,29 +1,145 @@
+import argparse
 import asyncio
+from urllib.parse import urlparse
 from utils.logging_config import setup_logging, get_logger
-from models.scanner import SubdomainScanner
+from katana.crawl import FleetCrawler
+from katana.js_analysis import JSAnalyzer
+from katana.katana import KatanaCrawler
+from subfinder.batch import BatchScanner, load_targets
 from utils.database import db_manager
+from utils.http_client import HTTPProbeClient
+from utils.metrics import MetricsExporter
 
 
 # Initialize logging
 logger = get_logger(__name__)
 
+DEFAULT_TARGET = "https://www.deere.com"
 
-async def main():
+
+def apex_domain(target: str) -> str:
+    """Domain a target URL or name is scanned under, as the finder cleans it"""
+    host = urlparse(target if '://' in target else f'https://{target}').netloc.lower()
+    return host[len('www.'):] if host.startswith('www.') else host
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Subdomain scanner")
+    parser.add_argument('targets', nargs='*', help="Apex domains or URLs to scan")
+    parser.add_argument('-f', '--targets-file', help="File with one target per line")
+    parser.add_argument('--parallel', type=int, default=4,
+                        help="Targets scanned at the same time (default: 4)")
+    parser.add_argument('--concurrency', type=int, default=200,
+                        help="Hosts validated at once across all targets (default: 200)")
+    parser.add_argument('--dns-rate', type=float, default=None,
+                        help="Upstream DNS queries per second across all targets (default: unlimited)")
+    parser.add_argument('--http-connections', type=int, default=200,
+                        help="Open HTTP connections across all targets (default: 200)")
+    parser.add_argument('--max-subprocesses', type=int, default=2,
+                        help="Subfinder processes running at the same time (default: 2)")
+    parser.add_argument('--processes', type=int, default=1,
+                        help="Worker processes validating the hosts of each target (default: 1)")
+    parser.add_argument('--distributed', action='store_true',
+                        help="Share each target's hosts with other nodes through leased tasks in the database")
+    parser.add_argument('--worker-only', action='store_true',
+                        help="With --distributed, skip enumeration and only validate leased tasks")
+    parser.add_argument('--join-timeout', type=float, default=60,
+                        help="With --worker-only, seconds to wait for a running scan to join (default: 60)")
+    parser.add_argument('--database-url', default=db_manager.database_url,
+                        help=f"SQLAlchemy async database URL (default: {db_manager.database_url})")
+    parser.add_argument('--freshness-window', type=float, default=None,
+                        help="Skip probing hosts fully checked within this many seconds")
+    parser.add_argument('--bruteforce', action='store_true', help="Run a DNS bruteforce after enumeration")
+    parser.add_argument('--wordlist', help="Wordlist for the DNS bruteforce")
+    parser.add_argument('--bruteforce-concurrency', type=int, default=5000,
+                        help="Bruteforce lookups in flight across all targets (default: 5000)")
+    parser.add_argument('--crawl', action='store_true', help="Crawl every live host with katana after scanning")
+    parser.add_argument('--katana-path', default='katana', help="Katana binary (default: katana on PATH)")
+    parser.add_argument('--crawl-processes', type=int, default=4,
+                        help="Katana processes running at the same time (default: 4)")
+    parser.add_argument('--crawl-timeout', type=float, default=600,
+                        help="Seconds a single host may be crawled for (default: 600)")
+    parser.add_argument('--crawl-template-paths', action='store_true',
+                        help="Count URLs differing only in numeric, UUID or hex IDs as one endpoint")
+    parser.add_argument('--crawl-memory-mb', type=int, default=4096,
+                        help="Memory ceiling for the crawl stage in MiB (default: 4096)")
+    parser.add_argument('--analyze-js', action='store_true',
+                        help="With --crawl, fetch discovered scripts and extract endpoints and secrets")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics while running")
+    parser.add_argument('--metrics-file', default=None,
+                        help="Rewrite a JSON metrics snapshot to this file while running")
+    parser.add_argument('--metrics-interval', type=float, default=15,
+                        help="Seconds between --metrics-file updates (default: 15)")
+    parser.add_argument('--no-resume', action='store_true', help="Start new scan runs instead of resuming")
+    parser.add_argument('--no-verify-ssl', action='store_true', help="Skip TLS certificate verification")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
     """Main entry point for the scanner"""
+    args = parse_args(argv)
+
     # Setup application-wide logging and database
     setup_logging()
-    
+
     # Ensure database is initialized
-    db_manager._setup_engine()
-    
+    db_manager.database_url = args.database_url
+    await db_manager.init()
+    exporter = MetricsExporter(port=args.metrics_port, path=args.metrics_file, interval=args.metrics_interval)
+
     try:
-        target = "https://www.deere.com"
-        logger.info(f"Starting subdomain scanner for target: {target}")
-        await SubdomainScanner.scan_target(target)
-        logger.info("Scan completed. Results saved to scan_results.json")
+        await exporter.start()
+        targets = load_targets(args.targets, args.targets_file) or [DEFAULT_TARGET]
+        logger.info(f"Starting subdomain scanner for {len(targets)} targets")
+        batch = BatchScanner(
+            targets,
+            max_parallel_targets=args.parallel,
+            concurrency=args.concurrency,
+            dns_rate=args.dns_rate,
+            bruteforce_concurrency=args.bruteforce_concurrency,
+            http_connections=args.http_connections,
+            max_subprocesses=args.max_subprocesses,
+            verify_ssl=not args.no_verify_ssl,
+            freshness_window=args.freshness_window,
+            processes=args.processes,
+            distributed=args.distributed or args.worker_only,
+            enumerate_hosts=not args.worker_only,
+            join_timeout=args.join_timeout,
+            include_bruteforce=args.bruteforce,
+            wordlist=args.wordlist,
+            resume=not args.no_resume
+        )
+        errors = await batch.run()
+        for target, error in errors.items():
+            logger.error(f"Scan of {target} failed: {str(error)}")
+
+        if args.crawl:
+            js_client = HTTPProbeClient(verify_ssl=not args.no_verify_ssl) if args.analyze_js else None
+            js_analyzer = JSAnalyzer(js_client) if js_client else None
+            crawler = FleetCrawler(
+                KatanaCrawler(args.katana_path, template_paths=args.crawl_template_paths),
+                max_processes=args.crawl_processes,
+                host_timeout=args.crawl_timeout,
+                memory_limit=args.crawl_memory_mb * 1024 * 1024,
+                js_analyzer=js_analyzer
+            )
+            try:
+                for target in targets:
+                    if target not in errors:
+                        await crawler.run(apex_domain(target))
+            finally:
+                crawler.close()
+                if js_analyzer:
+                    await js_analyzer.close()
+                    await js_client.close()
+        logger.info(f"Scan completed. Results saved to {db_manager.database_url}")
     except Exception as e:
         logger.error(f"Fatal error in main: {str(e)}", exc_info=True)
         raise
+    finally:
+        await db_manager.close()
+        await exporter.close()
 
 
 if __name__ == "__main__":
@@ -5,9 +5,11 @@ from sqlalchemy import (
     Column,
     DateTime,
     Enum,
+    ForeignKey,
     Integer,
     JSON,
     String,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import DeclarativeBase
 
@@ -27,8 +29,9 @@ class SubdomainSource(enum.Enum):
 class Subdomain(Base):
     __tablename__ = 'subdomains'
     id = Column(Integer, primary_key=True)
-    domain = Column(String, nullable=False)
+    domain = Column(String, nullable=False, unique=True)
     source = Column(Enum(SubdomainSource))
+    sources = Column(JSON)  # Every passive source that reported this host
     discovery_time = Column(DateTime, default=datetime.utcnow)
     is_alive = Column(Boolean, default=False)
     ip_addresses = Column(JSON)
@@ -46,6 +49,7 @@ class EndpointSource(enum.Enum):
 
 class Endpoint(Base):
     __tablename__ = 'endpoints'
+    __table_args__ = (UniqueConstraint('subdomain_id', 'path', 'method'),)
     id = Column(Integer, primary_key=True)
     subdomain_id = Column(Integer, ForeignKey('subdomains.id'))
     path = Column(String, nullable=False)
@@ -55,17 +59,51 @@ class Endpoint(Base):
     content_type = Column(String)
     status_code = Column(Integer)
     response_size = Column(Integer)
+    body_hash = Column(String)  # SHA-256 of the response body in the blob store
+    body_size = Column(Integer)
     parameters = Column(JSON)  # Stores discovered URL/form parameters
     is_authenticated = Column(Boolean)  # Did we find this while authenticated?
     additional_info = Column(JSON)  # For framework-specific details
 
 class JavaScript(Base):
     __tablename__ = 'javascript_files'
+    __table_args__ = (UniqueConstraint('subdomain_id', 'url'),)
     id = Column(Integer, primary_key=True)
     subdomain_id = Column(Integer, ForeignKey('subdomains.id'))
     url = Column(String, nullable=False)
-    file_hash = Column(String)  # To track changes over time
+    file_hash = Column(String, index=True)  # To track changes over time
     endpoints_referenced = Column(JSON)  # API endpoints found in the code
     variables = Column(JSON)  # Interesting variables/config
     discovery_time = Column(DateTime, default=datetime.utcnow)
-    last_modified = Column(DateTime)
\ No newline at end of file
+    last_modified = Column(DateTime)
+
+class ScanRunStatus(enum.Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+
+class ScanRun(Base):
+    __tablename__ = 'scan_runs'
+    id = Column(Integer, primary_key=True)
+    target = Column(String, nullable=False)
+    status = Column(Enum(ScanRunStatus), default=ScanRunStatus.RUNNING)
+    enumeration_done = Column(Boolean, default=False)  # Every host has been queued as a task
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+class ScanTaskState(enum.Enum):
+    PENDING = "pending"
+    IN_FLIGHT = "in_flight"
+    DONE = "done"
+
+class ScanTask(Base):
+    __tablename__ = 'scan_tasks'
+    __table_args__ = (UniqueConstraint('scan_run_id', 'domain'),)
+    id = Column(Integer, primary_key=True)
+    scan_run_id = Column(Integer, ForeignKey('scan_runs.id'), nullable=False)
+    domain = Column(String, nullable=False)
+    source = Column(Enum(SubdomainSource))
+    sources = Column(JSON)  # Passive sources known when the task was written
+    state = Column(Enum(ScanTaskState), default=ScanTaskState.PENDING)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    lease_owner = Column(String)  # Node validating the task in distributed scans
+    lease_expires_at = Column(DateTime)  # After this another node may reclaim the task
@@ -1,3 +1,3 @@
-from .subfinder import Subfinder
+from .subfinder import Subfinder, SubfinderResult
 
-__all__ = ['Subfinder']
+__all__ = ['Subfinder', 'SubfinderResult']
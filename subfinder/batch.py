@@ -0,0 +1,166 @@
+import asyncio
+import json
+import re
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+from utils.dns_cache import CachingResolver
+from utils.http_client import HTTPProbeClient
+from utils.logging_config import get_component_logger
+from utils.metrics import metrics
+from utils.rate_limit import RateLimiter
+from subfinder.scanner import SubdomainScanner
+
+
+def load_targets(targets: Iterable[str] = (), targets_file: Optional[str] = None) -> List[str]:
+    """
+    Combine targets given directly with those listed in a file, one per line.
+
+    Blank lines and lines starting with '#' are ignored, and duplicates are
+    dropped while keeping the original order.
+    """
+    collected = list(targets)
+    if targets_file:
+        with open(targets_file) as f:
+            collected.extend(line.strip() for line in f)
+    return list(dict.fromkeys(
+        target.strip() for target in collected
+        if target.strip() and not target.strip().startswith('#')
+    ))
+
+
+class BatchScanner:
+    """
+    Scan many targets in one process under a single shared budget.
+
+    Up to ``max_parallel_targets`` scans run at once and share one DNS cache
+    and query rate, one pooled HTTP client and a cap on subfinder processes.
+    The global validation concurrency is split evenly between the running
+    scans, so a target with thousands of hosts gets the same share of workers
+    (and of the FIFO DNS rate limiter) as a small one instead of starving it.
+    The DNS bruteforce concurrency cap is split the same way, and so are the
+    DNS rate and HTTP connections handed to scans validating in worker
+    processes, which cannot use the shared resolver and client.
+    """
+
+    def __init__(self, targets: Iterable[str], max_parallel_targets: int = 4,
+                 concurrency: int = 200, dns_rate: Optional[float] = None,
+                 bruteforce_concurrency: int = 5000,
+                 http_connections: int = 200, max_subprocesses: int = 2,
+                 verify_ssl: bool = True, **scan_kwargs):
+        """
+        Args:
+            targets: Apex domains or URLs to scan
+            max_parallel_targets: Scans running at the same time
+            concurrency: Hosts validated at once across all running scans
+            dns_rate: Upstream DNS queries per second across all scans (None for unlimited),
+                      bruteforce lookups included
+            bruteforce_concurrency: Bruteforce lookups in flight across all scans
+            http_connections: Open HTTP connections across all scans
+            max_subprocesses: Subfinder processes running at the same time
+            verify_ssl: Verify TLS certificates when probing
+            scan_kwargs: Passed on to every SubdomainScanner
+        """
+        self.id = uuid.uuid4()
+        self.targets = list(dict.fromkeys(targets))
+        self.max_parallel_targets = max(1, max_parallel_targets)
+        self.concurrency = concurrency
+        self.bruteforce_concurrency = bruteforce_concurrency
+        self.dns_rate = dns_rate
+        self.http_connections = http_connections
+        self.scan_kwargs = scan_kwargs
+        self.resolver = CachingResolver(rate_limiter=RateLimiter(dns_rate))
+        self.http_client = HTTPProbeClient(resolver=self.resolver, limit=http_connections,
+                                           verify_ssl=verify_ssl)
+        self.subprocess_slots = asyncio.Semaphore(max_subprocesses)
+        self.errors: Dict[str, Exception] = {}
+        self.logger = get_component_logger('batch', instance_id=self.id)
+        self.logger.info(
+            f"Initialized BatchScanner for {len(self.targets)} targets "
+            f"({self.max_parallel_targets} at a time, dns_rate={dns_rate}, "
+            f"http_connections={http_connections}, max_subprocesses={max_subprocesses})"
+        )
+
+    @property
+    def active_targets(self) -> int:
+        return min(self.max_parallel_targets, len(self.targets)) or 1
+
+    @property
+    def per_target_concurrency(self) -> int:
+        return max(1, self.concurrency // self.active_targets)
+
+    @property
+    def per_target_bruteforce_concurrency(self) -> int:
+        return max(1, self.bruteforce_concurrency // self.active_targets)
+
+    @property
+    def per_target_dns_rate(self) -> Optional[float]:
+        return self.dns_rate / self.active_targets if self.dns_rate else None
+
+    @property
+    def per_target_http_connections(self) -> int:
+        return max(1, self.http_connections // self.active_targets)
+
+    async def run(self) -> Dict[str, Exception]:
+        """
+        Scan every target, continuing past targets that fail.
+
+        Returns:
+            Mapping of target to the error that stopped its scan
+        """
+        start_time = datetime.utcnow()
+        pending = asyncio.Queue()
+        for target in self.targets:
+            pending.put_nowait(target)
+
+        runners = [
+            asyncio.create_task(self._run_targets(pending))
+            for _ in range(min(self.max_parallel_targets, len(self.targets)))
+        ]
+        try:
+            await asyncio.gather(*runners)
+        finally:
+            for runner in runners:
+                runner.cancel()
+            await asyncio.gather(*runners, return_exceptions=True)
+            await self.http_client.close()
+
+        duration = (datetime.utcnow() - start_time).total_seconds()
+        self.logger.info(
+            f"Batch completed in {duration:.2f} seconds: "
+            f"{len(self.targets) - len(self.errors)} targets scanned, {len(self.errors)} failed"
+        )
+        # Scans share the process-wide registry, so it is summarized once for the whole batch
+        self.logger.info(f"Process metrics: {json.dumps(metrics.snapshot())}")
+        return self.errors
+
+    async def _run_targets(self, pending: asyncio.Queue):
+        """Take targets off the queue one at a time until it is empty"""
+        while not pending.empty():
+            target = pending.get_nowait()
+            scanner = SubdomainScanner(
+                target,
+                concurrency=self.per_target_concurrency,
+                bruteforce_concurrency=self.per_target_bruteforce_concurrency,
+                dns_rate=self.per_target_dns_rate,
+                http_limit=self.per_target_http_connections,
+                resolver=self.resolver,
+                http_client=self.http_client,
+                subprocess_slots=self.subprocess_slots,
+                output_file=self._output_file(target),
+                report_metrics=False,
+                **self.scan_kwargs
+            )
+            try:
+                await scanner.run_scan()
+            except Exception as e:
+                # run_scan() has already logged the traceback
+                self.errors[target] = e
+
+    @staticmethod
+    def _output_file(target: str) -> str:
+        """Per-target subfinder output file so parallel scans don't overwrite each other"""
+        host = urlparse(target if '://' in target else f'https://{target}').netloc
+        return f"temp_results_{re.sub(r'[^A-Za-z0-9.-]', '_', host)}.json"
@@ -0,0 +1,192 @@
+import asyncio
+import itertools
+import mmap
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import aiodns
+
+from utils.logging_config import get_component_logger
+from utils.rate_limit import RateLimiter
+
+# Resolver errors that indicate we are pushing the upstream servers too hard
+CONGESTION_ERRORS = (aiodns.error.ARES_ETIMEOUT, aiodns.error.ARES_ECONNREFUSED)
+
+
+def iter_wordlist(path: str) -> Iterator[str]:
+    """Yield words from a newline separated wordlist without loading it into memory"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b''):
+                word = line.strip().lower()
+                if not word or word.startswith(b'#') or b' ' in word:
+                    continue
+                yield word.decode('ascii', errors='ignore')
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for DNS lookups.
+
+    The limit grows additively while lookups complete cleanly and is cut
+    multiplicatively when a window of lookups shows too many timeouts.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int,
+                 window: int = 500, backoff_ratio: float = 0.05):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.window = window
+        self.backoff_ratio = backoff_ratio
+        self.in_flight = 0
+        self._waiters = deque()
+        self._window_total = 0
+        self._window_congested = 0
+
+    async def acquire(self):
+        while self.in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self, congested: bool = False):
+        self.in_flight -= 1
+        self._window_total += 1
+        self._window_congested += congested
+
+        if self._window_total >= self.window:
+            ratio = self._window_congested / self._window_total
+            if ratio > self.backoff_ratio:
+                self.limit = max(self.minimum, int(self.limit * 0.7))
+            elif ratio < self.backoff_ratio / 5:
+                self.limit = min(self.maximum, self.limit + max(1, self.limit // 10))
+            self._window_total = 0
+            self._window_congested = 0
+
+        while self._waiters and self.in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+
+class DNSBruteforcer:
+    """
+    Resolve wordlist candidates under a set of zones as fast as the resolvers allow.
+
+    The wordlist is memory-mapped and streamed once per zone. Lookups are spread
+    round-robin over a pool of independent c-ares channels and gated by an
+    AdaptiveLimiter so concurrency settles just below the point where the
+    upstream resolvers start timing out. A shared RateLimiter, when given,
+    additionally caps lookups per second together with every other DNS consumer.
+    """
+
+    def __init__(self, wordlist_path: str, nameservers: Optional[Sequence[str]] = None,
+                 pool_size: int = 4, initial_concurrency: int = 200,
+                 min_concurrency: int = 20, max_concurrency: int = 5000,
+                 timeout: float = 2.0, tries: int = 2,
+                 rate_limiter: Optional[RateLimiter] = None, **resolver_kwargs):
+        self.wordlist_path = wordlist_path
+        self.nameservers = list(nameservers) if nameservers else None
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.tries = tries
+        self.resolver_kwargs = resolver_kwargs
+        self.rate_limiter = rate_limiter
+        self.limiter = AdaptiveLimiter(
+            min(initial_concurrency, max_concurrency),
+            min(min_concurrency, max_concurrency),
+            max_concurrency
+        )
+        self.queries = 0
+        self.hits = 0
+        self.logger = get_component_logger('bruteforce')
+
+    def _build_pool(self) -> List[aiodns.DNSResolver]:
+        return [
+            aiodns.DNSResolver(
+                nameservers=self.nameservers,
+                timeout=self.timeout,
+                tries=self.tries,
+                **self.resolver_kwargs
+            )
+            for _ in range(self.pool_size)
+        ]
+
+    def candidates(self, zones: Iterable[str]) -> Iterator[str]:
+        for zone in zones:
+            for word in iter_wordlist(self.wordlist_path):
+                yield f"{word}.{zone}"
+
+    async def run(self, zones: Iterable[str]) -> AsyncIterator[Tuple[str, List[str]]]:
+        """
+        Yield (hostname, ip_addresses) for every candidate that resolves.
+
+        Args:
+            zones: Parent zones to generate candidates under
+        """
+        zones = list(zones)
+        self.logger.info(f"Starting DNS bruteforce of {len(zones)} zones using {self.wordlist_path}")
+        start = time.monotonic()
+
+        pool = itertools.cycle(self._build_pool())
+        hits = asyncio.Queue()
+        lookups = set()
+        done = object()
+
+        async def resolve(candidate: str, resolver: aiodns.DNSResolver):
+            congested = False
+            try:
+                answers = await resolver.query(candidate, 'A')
+                await hits.put((candidate, [answer.host for answer in answers]))
+            except aiodns.error.DNSError as e:
+                congested = bool(e.args) and e.args[0] in CONGESTION_ERRORS
+            finally:
+                self.limiter.release(congested)
+
+        async def produce():
+            try:
+                for candidate in self.candidates(zones):
+                    await self.limiter.acquire()
+                    if self.rate_limiter is not None:
+                        await self.rate_limiter.acquire()
+                    self.queries += 1
+                    task = asyncio.create_task(resolve(candidate, next(pool)))
+                    lookups.add(task)
+                    task.add_done_callback(lookups.discard)
+                if lookups:
+                    await asyncio.gather(*lookups, return_exceptions=True)
+            finally:
+                await hits.put(done)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await hits.get()
+                if item is done:
+                    break
+                self.hits += 1
+                yield item
+            await producer
+        finally:
+            producer.cancel()
+            for task in list(lookups):
+                task.cancel()
+            await asyncio.gather(producer, *lookups, return_exceptions=True)
+
+            elapsed = max(time.monotonic() - start, 1e-6)
+            self.logger.info(
+                f"DNS bruteforce finished: {self.queries} lookups, {self.hits} hits "
+                f"in {elapsed:.2f} seconds ({self.queries / elapsed:.0f} lookups/sec, "
+                f"final concurrency {self.limiter.limit})"
+            )
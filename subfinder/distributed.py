@@ -0,0 +1,91 @@
+import asyncio
+import os
+import socket
+import uuid
+from typing import List
+
+from models.models import ScanRunStatus
+from utils.database import db_manager
+from utils.logging_config import get_component_logger
+
+
+def default_lease_owner() -> str:
+    """Identify this node and process in lease columns"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaseDispatcher:
+    """
+    Feed a finder's workers from the shared scan_tasks table instead of a local queue.
+
+    Hosts found during enumeration are only written as pending tasks. Every
+    node taking part in the run, including the one enumerating, claims
+    batches of open tasks under a time-limited lease and validates them. A
+    task whose lease runs out before it is marked done is claimed again by
+    whichever node asks next. Subdomain rows are upserts, so a host validated
+    twice after a reclaim is harmless.
+    """
+
+    def __init__(self, finder, owner: str = None, batch_size: int = 100,
+                 lease_seconds: float = 300, poll_interval: float = 5):
+        """
+        Args:
+            finder: SubdomainFinder with a checkpointed scan run
+            owner: Lease owner recorded on claimed tasks; unique per process
+            batch_size: Tasks claimed at a time
+            lease_seconds: How long a claimed batch is reserved; must exceed the
+                           time this node needs to validate one batch
+            poll_interval: Seconds to wait when nothing is claimable yet
+        """
+        self.finder = finder
+        self.owner = owner or default_lease_owner()
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.claimed = 0
+        self._claimer = None
+        self.logger = get_component_logger('distributed')
+
+    def start(self):
+        self._claimer = asyncio.create_task(self._claim_batches())
+        self.logger.info(f"Validating tasks of scan run {self.finder.scan_run.id} as {self.owner}")
+
+    async def submit(self, domain: str, source: str, sources: List[str]):
+        # The pending task row the finder just buffered is all other nodes need
+        pass
+
+    async def join(self):
+        """Wait until the run is enumerated and every task is done, by any node"""
+        await self._claimer
+        self.logger.info(f"{self.owner} validated {self.claimed} claimed tasks")
+
+    async def close(self):
+        if self._claimer is not None and not self._claimer.done():
+            self._claimer.cancel()
+            await asyncio.gather(self._claimer, return_exceptions=True)
+
+    async def _claim_batches(self):
+        scan_run_id = self.finder.scan_run.id
+        while True:
+            # Make our own pending rows and finished tasks visible before claiming
+            await db_manager.flush()
+            tasks = await db_manager.claim_scan_tasks(
+                scan_run_id, self.owner, self.batch_size, self.lease_seconds
+            )
+            if tasks:
+                self.claimed += len(tasks)
+                self.logger.debug(f"Claimed {len(tasks)} tasks of scan run {scan_run_id}")
+                await self.finder.validate_hosts(_iterate(tasks))
+                continue
+
+            scan_run = await db_manager.get_scan_run(scan_run_id)
+            if scan_run.status == ScanRunStatus.COMPLETED:
+                return
+            if scan_run.enumeration_done and not await db_manager.count_open_scan_tasks(scan_run_id):
+                return
+            await asyncio.sleep(self.poll_interval)
+
+
+async def _iterate(tasks):
+    for task in tasks:
+        yield task
@@ -1,35 +1,128 @@
 import asyncio
 import aiohttp
 import aiodns
-import dns.resolver
 import json
+import logging
 import os
+import time
+from models.models import ScanRunStatus, ScanTaskState
 from utils.database import db_manager
-import socket
 import traceback
 import uuid
-from datetime import datetime
+from collections import Counter
+from contextlib import aclosing, nullcontext
+from datetime import datetime, timedelta
 from urllib.parse import urlparse
 
-from utils.logging_config import get_component_logger
+from utils.dns_cache import NEGATIVE_ERRORS, CachingResolver
+from utils.http_client import HTTPProbeClient
+from utils.logging_config import LogSampler, get_component_logger
+from utils.metrics import metrics
+from utils.rate_limit import RateLimiter
 from subfinder import Subfinder
+from subfinder.bruteforce import DNSBruteforcer
+from subfinder.distributed import LeaseDispatcher
+from subfinder.sharding import ShardedValidator
+from subfinder.wildcard import WildcardDetector
+
+# Seconds between checks for a scan run to join when not enumerating
+JOIN_POLL_INTERVAL = 5
 
 
 class SubdomainFinder:
-    def __init__(self, target: str, rate_limit=5):
+    def __init__(self, target: str, rate_limit=5, concurrency=50, validation_rate=None, resolver=None,
+                 http_client=None, include_bruteforce=False, wordlist=None, bruteforce_max_zones=25,
+                 bruteforce_concurrency=5000,
+                 freshness_window=None, recheck_fresh=True, checkpoint=False, resume=True,
+                 subprocess_slots=None, output_file=None, processes=1, sink=None,
+                 distributed=False, enumerate_hosts=True, lease_owner=None, lease_batch_size=100,
+                 lease_seconds=300, join_timeout=60, dns_rate=None, http_limit=None):
+        """
+        Args:
+            target: Apex domain to enumerate
+            rate_limit: Requests per second passed on to subfinder
+            concurrency: Number of hosts validated at the same time
+            validation_rate: Maximum hosts per second entering validation (None for unlimited)
+            resolver: Shared CachingResolver; a private one is created when omitted
+            http_client: Shared HTTPProbeClient; a private one is created when omitted
+            include_bruteforce: Run a DNS bruteforce after passive enumeration
+            wordlist: Path to the bruteforce wordlist
+            bruteforce_max_zones: Most populated parent zones to bruteforce under
+            bruteforce_concurrency: Most bruteforce lookups in flight at once
+            freshness_window: Seconds since a stored host's last full check during which it
+                              is not probed again (None validates every host)
+            recheck_fresh: Re-resolve fresh hosts and fully validate those whose addresses
+                           changed; when False fresh hosts are skipped outright
+            checkpoint: Record the scan run and every host's task state in the database
+            resume: With checkpoint, continue the target's latest unfinished run instead
+                    of starting a new one
+            subprocess_slots: Semaphore shared by finders to cap concurrent subfinder processes
+            output_file: File subfinder also writes its JSON results to (None keeps no copy)
+            processes: Worker processes to validate hosts in; 1 validates on this event loop
+            sink: Receives subdomain rows and task states; defaults to db_manager
+            distributed: Share the run's tasks with other nodes through leases on the
+                         scan_tasks table (implies checkpoint)
+            enumerate_hosts: Run subfinder and the bruteforce; distributed nodes that only
+                             validate the run's tasks set this to False
+            lease_owner: Name recorded on leased tasks; generated when omitted
+            lease_batch_size: Tasks leased at a time in distributed mode
+            lease_seconds: Lease length in distributed mode
+            join_timeout: Seconds a node that does not enumerate waits for the target's
+                          running scan run to appear before giving up
+            dns_rate: DNS queries per second split between validation processes; defaults
+                      to the resolver's rate. Scans sharing a resolver pass their share
+            http_limit: HTTP connections split between validation processes; defaults to
+                        the HTTP client's limit. Scans sharing a client pass their share
+        """
         self.id = uuid.uuid4()
-        self.logger = get_component_logger('finder', include_id=True)
+        self.logger = get_component_logger('finder', instance_id=self.id)
+        # Per-host events are sampled so large scans log a summary instead of every host
+        self.found_log = LogSampler(self.logger, burst=20, interval=30.0, label='subdomains found')
+        self.error_log = LogSampler(self.logger, logging.ERROR, burst=3, interval=30.0,
+                                    label='host validation errors')
         self.discovered = set()
+        self.sources = {}  # host -> every passive source that reported it
         self.results = []  # Store results in memory
-        self._http_session = None
-        self.resolver = aiodns.DNSResolver()
+        self.resolver = resolver or CachingResolver()
         self.rate_limit = rate_limit
-        self.semaphore = asyncio.Semaphore(rate_limit)
-        self._http_session = aiohttp.ClientSession(
-            timeout=aiohttp.ClientTimeout(total=30),
-            headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        )
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(validation_rate)
+        self.include_bruteforce = include_bruteforce
+        self.wordlist = wordlist
+        self.bruteforce_max_zones = bruteforce_max_zones
+        self.bruteforce_concurrency = bruteforce_concurrency
+        self.freshness_window = timedelta(seconds=freshness_window) if freshness_window else None
+        self.recheck_fresh = recheck_fresh
+        self.known = {}  # domain -> (last_checked, ip_addresses) from earlier scans
+        self.fresh_skipped = 0
+        if distributed and processes > 1:
+            raise ValueError("Distributed scans validate in-process; processes must be 1")
+        self.checkpoint = checkpoint or distributed
+        self.distributed = distributed
+        self.enumerate_hosts = enumerate_hosts
+        self.lease_owner = lease_owner
+        self.lease_batch_size = lease_batch_size
+        self.lease_seconds = lease_seconds
+        self.join_timeout = join_timeout
+        self.resume = resume
+        self.scan_run = None
+        self.completed = set()  # hosts finished by an earlier attempt of this run
+        self.queued = set()  # hosts already in the run's task table, for distributed scans
+        self.subprocess_slots = subprocess_slots
+        self.output_file = output_file
+        self.processes = processes
+        self.dns_rate = dns_rate
+        self.http_limit = http_limit
+        self.sink = sink or db_manager
+        self._dispatcher = None
+        self._zone_counts = Counter()
+        self._queue = None
+        self._workers = []
+        # Finders created without a scan-owned client get a private one they close themselves
+        self._owns_http_client = http_client is None
+        self.http_client = http_client or HTTPProbeClient(resolver=self.resolver)
         self.target = self._clean_target(target)
+        self.wildcard_detector = WildcardDetector(self.resolver, self.target)
         self.logger.info(f"Initialized SubdomainFinder for target: {self.target} with rate limit: {rate_limit}")
 
     def _clean_target(self, target: str) -> str:
@@ -46,7 +139,16 @@ class SubdomainFinder:
         """Resolve domain to IP addresses"""
         self.logger.debug(f"Resolving IP addresses for {domain}")
         try:
-            answers = await self.resolver.query(domain, 'A')
+            with metrics.timer('dns_a'):
+                try:
+                    answers = await self.resolver.query(domain, 'A')
+                except aiodns.error.DNSError as e:
+                    # NXDOMAIN and NoAnswer are ordinary answers; dns_a_errors counts real failures
+                    if e.args[0] not in NEGATIVE_ERRORS:
+                        raise
+                    metrics.inc('dns_a_negative')
+                    self.logger.debug(f"No A records for {domain}: {self._dns_error_message(e)}")
+                    return []
             ips = [answer.host for answer in answers]
             self.logger.debug(f"Resolved {domain} to {ips}")
             return ips
@@ -59,23 +161,50 @@ class SubdomainFinder:
         start_time = datetime.utcnow()
 
         try:
-            # Use subfinder for initial passive enumeration
-            subfinder = (Subfinder(self.target)
-                         .set_rate_limits(global_limit=self.rate_limit)
-                         .set_output("temp_results.json", json=True))
+            if self.freshness_window:
+                self.known = await db_manager.load_known_subdomains(self.target)
+                self.logger.info(f"Loaded {len(self.known)} previously scanned hosts for {self.target}")
 
-            self.logger.debug("Running Subfinder passive enumeration")
-            discovered_domains = await subfinder.run()
-            self.logger.info(f"Subfinder discovered {len(discovered_domains)} potential subdomains")
+            unfinished = await self._load_checkpoint() if self.checkpoint else []
+
+            # Validate discovered domains through the worker pool while subfinder is still running
+            if self.distributed:
+                self._dispatcher = LeaseDispatcher(
+                    self, self.lease_owner, self.lease_batch_size, self.lease_seconds
+                )
+                self._dispatcher.start()
+            elif self.processes > 1:
+                self._dispatcher = ShardedValidator(self, self.processes)
+                self._dispatcher.start()
+            else:
+                self._start_workers()
+
+            if self.distributed:
+                # Unfinished tasks stay in the shared table, where any node can claim them
+                self.queued = {domain for domain, _, _ in unfinished}
+            else:
+                for domain, source, sources in unfinished:
+                    self.sources.setdefault(domain, set()).update(sources)
+                    await self._enqueue(domain, source)
 
-            # Process and validate discovered domains
-            for domain in discovered_domains:
-                await self._store_subdomain(domain, "PASSIVE")
+            if self.scan_run is not None and self.scan_run.enumeration_done:
+                self.logger.info("Enumeration already finished for this run, skipping subfinder")
+            elif self.enumerate_hosts:
+                await self._enumerate()
+                if self.scan_run is not None:
+                    await self._save_task_sources()
+                    await db_manager.update_scan_run(self.scan_run.id, enumeration_done=True)
 
-            # Optionally continue with DNS bruteforce for more aggressive scanning
-            if hasattr(self, 'include_bruteforce') and self.include_bruteforce:
-                self.logger.info("Starting DNS brute-forcing...")
-                await self.find_from_dns_bruteforce()
+            if self._dispatcher is not None:
+                await self._dispatcher.join()
+            else:
+                await self._queue.join()
+            await self._save_late_sources()
+            await db_manager.flush()
+            if self.scan_run is not None:
+                await db_manager.update_scan_run(
+                    self.scan_run.id, status=ScanRunStatus.COMPLETED, finished_at=datetime.utcnow()
+                )
 
             end_time = datetime.utcnow()
             duration = (end_time - start_time).total_seconds()
@@ -83,6 +212,10 @@ class SubdomainFinder:
                 f"Discovery completed in {duration:.2f} seconds. "
                 f"Found {len(self.discovered)} subdomains"
             )
+            if self.freshness_window:
+                self.logger.info(f"Skipped full validation of {self.fresh_skipped} recently checked hosts")
+            if self.wildcard_detector.wildcard_zones:
+                self.logger.info(f"Wildcard DNS zones: {', '.join(self.wildcard_detector.wildcard_zones)}")
 
         except Exception as e:
             self.logger.error(
@@ -91,48 +224,338 @@ class SubdomainFinder:
             )
             raise
         finally:
-            if self._http_session:
-                await self._http_session.close()
-                self.logger.debug("Closed HTTP session")
+            self.found_log.flush()
+            self.error_log.flush()
+            await self._stop_workers()
+            if self._dispatcher is not None:
+                await self._dispatcher.close()
+            if self._owns_http_client:
+                await self.http_client.close()
+
+    async def _enumerate(self):
+        """Queue every host reported by subfinder and, when enabled, the DNS bruteforce"""
+        # Use subfinder for initial passive enumeration
+        subfinder = (Subfinder(self.target)
+                     .set_rate_limits(global_limit=self.rate_limit)
+                     .set_output(self.output_file, json=True))
+
+        discovered_count = 0
+        async with self.subprocess_slots or nullcontext():
+            self.logger.debug("Running Subfinder passive enumeration")
+            with metrics.timer('subfinder') as timing:
+                async with aclosing(subfinder.stream_results()) as results:
+                    async for result in results:
+                        discovered_count += 1
+                        metrics.inc('subfinder_records')
+                        # Time blocked on a full validation queue is validation's, recorded as 'enqueue'
+                        ingest_start = time.perf_counter()
+                        await self._ingest(result.host, result.source)
+                        timing.exclude(time.perf_counter() - ingest_start)
+        self.logger.info(
+            f"Subfinder reported {discovered_count} records for {len(self.sources)} unique hosts"
+        )
+
+        # Optionally continue with DNS bruteforce for more aggressive scanning
+        if self.include_bruteforce:
+            self.logger.info("Starting DNS brute-forcing...")
+            await metrics.measure('bruteforce', self.find_from_dns_bruteforce())
+
+    async def _load_checkpoint(self):
+        """
+        Start or resume the scan run and load its task states.
+
+        Returns:
+            (domain, source, sources) of tasks that were queued or in flight when the run stopped
+        """
+        if self.enumerate_hosts:
+            self.scan_run = await db_manager.start_scan_run(self.target, resume=self.resume)
+        else:
+            self.scan_run = await self._join_scan_run()
+        tasks = await db_manager.load_scan_tasks(self.scan_run.id)
+        self.completed = {domain for domain, _, _ in tasks[ScanTaskState.DONE]}
+        unfinished = tasks[ScanTaskState.PENDING] + tasks[ScanTaskState.IN_FLIGHT]
+        if self.completed or unfinished:
+            self.logger.info(
+                f"Checkpoint for run {self.scan_run.id}: {len(self.completed)} hosts done, "
+                f"{len(unfinished)} to resume"
+            )
+        return unfinished
+
+    async def _join_scan_run(self):
+        """
+        Wait for the target's running scan run, for nodes that only validate.
+
+        Such a node never starts a run itself: nothing would ever finish
+        enumerating it, so the node would poll for tasks forever.
+        """
+        deadline = asyncio.get_running_loop().time() + self.join_timeout
+        while True:
+            scan_run = await db_manager.get_running_scan_run(self.target)
+            if scan_run is not None:
+                self.logger.info(f"Joining scan run {scan_run.id} for {self.target}")
+                return scan_run
+            if asyncio.get_running_loop().time() >= deadline:
+                raise RuntimeError(
+                    f"No running scan of {self.target} to join after {self.join_timeout:g} seconds; "
+                    f"start a node that enumerates the target first"
+                )
+            self.logger.debug(f"Waiting for a running scan of {self.target} to join")
+            await asyncio.sleep(min(JOIN_POLL_INTERVAL, self.join_timeout))
+
+    async def _save_task_state(self, domain: str, source: str, state: ScanTaskState):
+        if self.scan_run is not None:
+            await self.sink.save_scan_task(
+                self.scan_run.id, domain, source, state, sorted(self.sources.get(domain) or ())
+            )
+
+    async def validate_hosts(self, hosts):
+        """
+        Validate hosts from an async iterable of (domain, source, sources) without enumerating.
+
+        Used by validation processes, which receive their hosts from the parent, and
+        by distributed scans for every batch of leased tasks.
+        """
+        self._start_workers()
+        try:
+            async for domain, source, sources in hosts:
+                self.sources.setdefault(domain, set()).update(sources)
+                await self._queue.put((domain, source))
+            await self._queue.join()
+        finally:
+            self.found_log.flush()
+            self.error_log.flush()
+            await self._stop_workers()
+
+    def _start_workers(self):
+        """Start the bounded pool of validation workers"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        metrics.register_gauge('validation_queue_depth', self._queue_depth)
+        self._workers = [
+            asyncio.create_task(self._validation_worker())
+            for _ in range(self.concurrency)
+        ]
+        self.logger.debug(f"Started {self.concurrency} validation workers")
+
+    async def _stop_workers(self):
+        """Cancel idle validation workers and wait for them to exit"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        metrics.unregister_gauge('validation_queue_depth', self._queue_depth)
+
+    def _queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _enqueue(self, domain: str, source: str):
+        """Queue a domain for validation, waiting while the queue is full"""
+        if domain in self.completed or domain in self.queued:
+            return
+        await self._save_task_state(domain, source, ScanTaskState.PENDING)
+        zone = self.wildcard_detector.parent_zone(domain)
+        if zone:
+            self._zone_counts[zone] += 1
+        with metrics.timer('enqueue'):
+            if self._dispatcher is not None:
+                await self._dispatcher.submit(domain, source, sorted(self.sources.get(domain) or ()))
+            else:
+                await self._queue.put((domain, source))
+
+    async def _ingest(self, domain: str, source: str):
+        """Merge a passive record into its host's source set, queueing each host only once"""
+        sources = self.sources.get(domain)
+        if sources is not None:
+            sources.add(source)
+            return
+        self.sources[domain] = {source}
+        await self._enqueue(domain, "PASSIVE")
+
+    def _multi_source_hosts(self) -> dict:
+        """Sorted sources of every host reported by more than one source, the only ones a task can lack"""
+        return {domain: sorted(sources) for domain, sources in self.sources.items() if len(sources) > 1}
+
+    async def _save_task_sources(self):
+        """
+        Record every source of each enumerated host on its task.
+
+        Task rows are written when a host is first reported, so later sources
+        are missing from them; nodes claiming a task, and resumed runs, would
+        otherwise validate it with the first source only.
+        """
+        await db_manager.update_scan_task_sources(self.scan_run.id, self._multi_source_hosts())
+
+    async def _save_late_sources(self):
+        """Re-save hosts whose sources kept arriving after they were validated"""
+        validated = set()
+        for subdomain_data in self.results:
+            validated.add(subdomain_data['domain'])
+            sources = self.sources.get(subdomain_data['domain'])
+            if sources and len(sources) > len(subdomain_data['sources']):
+                subdomain_data['sources'] = sorted(sources)
+                await self.sink.save_subdomain(subdomain_data)
+
+        if self.distributed and self.enumerate_hosts:
+            # Other nodes validated the rest of the run, possibly from a task claimed
+            # before all of its sources were known
+            await db_manager.update_subdomain_sources({
+                domain: sources for domain, sources in self._multi_source_hosts().items()
+                if domain not in validated
+            })
+
+    async def find_from_dns_bruteforce(self):
+        """Bruteforce the apex and the busiest non-wildcard parent zones, validating every hit"""
+        if not self.wordlist:
+            self.logger.warning("DNS bruteforce requested but no wordlist configured, skipping")
+            return
+
+        zones = [self.target] + [
+            zone for zone, _ in self._zone_counts.most_common(self.bruteforce_max_zones)
+            if zone != self.target
+        ]
+
+        # Every candidate resolves under a wildcard zone, so bruteforcing one only
+        # burns the lookup budget and leaks phantom hosts the fingerprint missed
+        fingerprints = await asyncio.gather(*(self.wildcard_detector.fingerprint(zone) for zone in zones))
+        wildcard_zones = [zone for zone, fingerprint in zip(zones, fingerprints) if fingerprint]
+        if wildcard_zones:
+            self.logger.info(f"Skipping DNS bruteforce of wildcard zones: {', '.join(wildcard_zones)}")
+        zones = [zone for zone, fingerprint in zip(zones, fingerprints) if not fingerprint]
+        if not zones:
+            return
+
+        # The resolver's rate limiter is the scan's (or batch's) DNS budget, which the
+        # bruteforce's private channels would otherwise bypass
+        bruteforcer = DNSBruteforcer(
+            self.wordlist,
+            max_concurrency=self.bruteforce_concurrency,
+            rate_limiter=self.resolver.rate_limiter
+        )
+        found = 0
+
+        async for domain, ip_addresses in bruteforcer.run(zones):
+            if domain in self.sources or domain in self.discovered:
+                continue
+            if await self.wildcard_detector.matches(domain, ip_addresses):
+                continue
+            found += 1
+            await self._enqueue(domain, "BRUTEFORCE")
+
+        self.logger.info(f"DNS bruteforce found {found} new candidate subdomains")
+
+    async def _validation_worker(self):
+        """Validate queued domains until cancelled"""
+        while True:
+            domain, source = await self._queue.get()
+            try:
+                await self.rate_limiter.acquire()
+                await self._save_task_state(domain, source, ScanTaskState.IN_FLIGHT)
+                await self._store_subdomain(domain, source)
+                await self._save_task_state(domain, source, ScanTaskState.DONE)
+            finally:
+                self._queue.task_done()
 
     async def _check_takeover(self, domain: str):
+        """
+        Flag a domain whose CNAME target no longer resolves.
+
+        Both lookups go through the shared aiodns resolver. A missing CNAME
+        (NoAnswer or NXDOMAIN) is the common case and is not an error.
+        """
         self.logger.debug(f"Checking {domain} for potential takeover")
         try:
-            answers = await asyncio.get_event_loop().run_in_executor(
-                None, lambda: dns.resolver.resolve(domain, 'CNAME')
-            )
-            cname = str(answers[0].target)
-            self.logger.debug(f"CNAME for {domain}: {cname}")
+            answer = await self.resolver.query(domain, 'CNAME')
+        except aiodns.error.DNSError as e:
+            if e.args[0] in (aiodns.error.ARES_ENODATA, aiodns.error.ARES_ENOTFOUND):
+                self.logger.debug(f"No CNAME record found for {domain}")
+            else:
+                self.logger.debug(f"CNAME lookup failed for {domain}: {self._dns_error_message(e)}")
+            return False
+
+        cname = answer.cname
+        self.logger.debug(f"CNAME for {domain}: {cname}")
 
+        for rtype in ('A', 'AAAA'):
             try:
-                await asyncio.get_event_loop().run_in_executor(
-                    None, lambda: socket.getaddrinfo(cname, 80)
-                )
+                await self.resolver.query(cname, rtype)
                 return False
-            except socket.gaierror:
-                self.logger.warning(f"Potential takeover: {domain} -> {cname}")
-                return True
-        except dns.resolver.NXDOMAIN:
-            self.logger.debug(f"No CNAME record found for {domain}")
-            return False
-        except Exception as e:
-            self.logger.error(f"Error checking takeover for {domain}: {str(e)}")
-            return False
+            except aiodns.error.DNSError as e:
+                if e.args[0] == aiodns.error.ARES_ENODATA:
+                    continue
+                if e.args[0] != aiodns.error.ARES_ENOTFOUND:
+                    self.logger.debug(
+                        f"Could not resolve CNAME target {cname} for {domain}: {self._dns_error_message(e)}"
+                    )
+                    return False
+                break
+
+        self.logger.warning(f"Potential takeover: {domain} -> {cname}")
+        return True
+
+    @staticmethod
+    def _dns_error_message(error: Exception) -> str:
+        return error.args[1] if len(error.args) > 1 else str(error)
 
     async def _probe_http(self, domain: str):
+        """
+        Probe http:// and fall back to https:// when the plain-text port is unreachable.
+
+        Both requests go through the scan's pooled session, so the host is
+        resolved once and connections stay alive for later requests. Only a
+        bounded prefix of the body is read.
+
+        Returns:
+            ProbeResult, or None when neither scheme answered
+        """
         self.logger.debug(f"Probing HTTP for {domain}")
-        try:
-            url = f"http://{domain}"
-            async with self._http_session.get(url, allow_redirects=False,
-                                              timeout=aiohttp.ClientTimeout(total=10)) as response:
-                self.logger.debug(f"HTTP probe for {domain} returned status {response.status}")
-                return response.status, await response.text()
-        except aiohttp.ClientError as e:
-            self.logger.debug(f"HTTP probe failed for {domain}: {str(e)}")
-            return None, None
-        except Exception as e:
-            self.logger.error(f"Unexpected error during HTTP probe of {domain}: {str(e)}")
-            return None, None
+
+        for scheme in ('http', 'https'):
+            url = f"{scheme}://{domain}"
+            try:
+                probe = await self.http_client.probe(url)
+                self.logger.debug(f"HTTP probe of {url} returned status {probe.status}")
+                return probe
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                self.logger.debug(f"HTTP probe of {url} failed: {str(e) or type(e).__name__}")
+                continue
+            except aiohttp.ClientError as e:
+                self.logger.debug(f"HTTP probe failed for {domain}: {str(e)}")
+                return None
+            except Exception as e:
+                self.logger.error(f"Unexpected error during HTTP probe of {domain}: {str(e)}")
+                return None
+
+        return None
+
+    async def _resolve_with_wildcard_check(self, domain: str):
+        """Resolve domain while fingerprinting its parent zone, and report whether it is a wildcard hit"""
+        zone = self.wildcard_detector.parent_zone(domain)
+        if zone is None:
+            return await self.resolve_domain(domain), False
+
+        ip_addresses, _ = await asyncio.gather(
+            self.resolve_domain(domain),
+            self.wildcard_detector.fingerprint(zone)
+        )
+        return ip_addresses, await self.wildcard_detector.matches(domain, ip_addresses)
+
+    async def _is_fresh(self, domain: str) -> bool:
+        """
+        True when domain was fully checked within the freshness window and still
+        resolves to the addresses stored for it, so probing it again can be skipped.
+        """
+        last_checked, stored_ips = self.known.get(domain, (None, None))
+        if last_checked is None or datetime.utcnow() - last_checked > self.freshness_window:
+            return False
+        if not self.recheck_fresh:
+            return True
+
+        ip_addresses = await self.resolve_domain(domain)
+        if set(ip_addresses) != set(stored_ips):
+            self.logger.debug(f"Addresses of {domain} changed since its last check, revalidating")
+            return False
+        return True
 
     async def _store_subdomain(self, domain: str, source: str):
         if domain in self.discovered:
@@ -140,48 +563,126 @@ class SubdomainFinder:
             return
 
         self.discovered.add(domain)
-        self.logger.info(f"Found new subdomain: {domain} from source: {source}")
+        if self.freshness_window and await self._is_fresh(domain):
+            self.fresh_skipped += 1
+            metrics.inc('hosts_fresh_skipped')
+            self.logger.debug(f"Skipping {domain}, checked within the freshness window")
+            return
 
-        try:
-            self.logger.debug(f"Starting validation checks for {domain}")
-            is_takeover_candidate = await self._check_takeover(domain)
-            status, content = await self._probe_http(domain)
-            ip_addresses = await self.resolve_domain(domain)
-
-            # Prepare subdomain data
-            subdomain_data = {
-                'domain': domain,
-                'source': source,
-                'ip_addresses': ip_addresses,
-                'is_alive': bool(ip_addresses),
-                'is_takeover_candidate': is_takeover_candidate,
-                'http_status': status,
-                'discovery_time': datetime.utcnow().isoformat(),
-                'last_checked': datetime.utcnow().isoformat()
-            }
-            
-            # Store in memory and database
-            self.results.append(subdomain_data)
-            
-            # Save to database
-            with db_manager.session_scope() as session:
-                db_manager.save_subdomain(session, subdomain_data)
-                
-            self.logger.debug(f"Successfully stored {domain} in memory and database")
+        self.found_log.log(f"Found new subdomain: {domain} from source: {source}")
 
+        try:
+            with metrics.timer('validate'):
+                await self._validate(domain, source)
         except Exception as e:
-            self.logger.error(
-                f"Error processing {domain}: {str(e)}\n"
-                f"Traceback: {traceback.format_exc()}"
+            # Only the first few errors of each kind carry a traceback; the rest are counted
+            self.error_log.log(f"Error processing {domain}: {str(e)}", key=type(e).__name__, exc_info=True)
+
+    async def _validate(self, domain: str, source: str):
+        """Resolve, check and probe one host, then hand its row to the sink"""
+        self.logger.debug(f"Starting validation checks for {domain}")
+        ip_addresses, is_wildcard = await self._resolve_with_wildcard_check(domain)
+
+        if is_wildcard:
+            self.logger.debug(f"{domain} matches its zone's wildcard DNS, skipping takeover and HTTP checks")
+            is_takeover_candidate, probe = False, None
+        else:
+            is_takeover_candidate, probe = await asyncio.gather(
+                metrics.measure('takeover', self._check_takeover(domain)),
+                metrics.measure('http_probe', self._probe_http(domain))
             )
 
+        additional_info = {'wildcard': is_wildcard}
+        if probe:
+            additional_info['http'] = probe.summary()
+
+        # Prepare subdomain data
+        subdomain_data = {
+            'domain': domain,
+            'source': source,
+            'sources': sorted(self.sources.get(domain) or {source.lower()}),
+            'ip_addresses': ip_addresses,
+            'is_alive': bool(ip_addresses),
+            'is_takeover_candidate': is_takeover_candidate,
+            'http_status': probe.status if probe else None,
+            'additional_info': additional_info,
+            'discovery_time': datetime.utcnow(),
+            'last_checked': datetime.utcnow()
+        }
+        
+        # Store in memory and database
+        self.results.append(subdomain_data)
+        
+        # Buffer for the next batched database write
+        await self.sink.save_subdomain(subdomain_data)
+
+        metrics.inc('hosts_validated')
+        if ip_addresses:
+            metrics.inc('hosts_alive')
+        if is_takeover_candidate:
+            metrics.inc('takeover_candidates')
+        self.logger.debug(f"Successfully stored {domain} in memory and database")
+
 
 class SubdomainScanner:
-    def __init__(self, target: str):
+    def __init__(self, target: str, concurrency: int = 50, validation_rate=None,
+                 include_bruteforce: bool = False, wordlist: str = None, bruteforce_concurrency: int = 5000,
+                 verify_ssl: bool = True,
+                 freshness_window=None, resume: bool = True, resolver: CachingResolver = None,
+                 http_client: HTTPProbeClient = None, subprocess_slots: asyncio.Semaphore = None,
+                 output_file: str = None, processes: int = 1,
+                 distributed: bool = False, enumerate_hosts: bool = True, metrics_file: str = None,
+                 report_metrics: bool = True, dns_rate: float = None, http_limit: int = None,
+                 join_timeout: float = 60):
+        """
+        Args:
+            bruteforce_concurrency: Most bruteforce lookups in flight at once
+            resolver: CachingResolver shared with other scans; a private one is created when omitted
+            http_client: HTTPProbeClient shared with other scans; a private one is created
+                         and closed by run_scan() when omitted
+            subprocess_slots: Semaphore capping subfinder processes across scans
+            output_file: File subfinder also writes its JSON results to (None keeps no copy)
+            processes: Worker processes validating hosts, each with its own event loop,
+                       resolver and HTTP pool; 1 keeps validation on this loop
+            dns_rate: This scan's share of a shared resolver's DNS rate, split between its
+                      validation processes (default: the resolver's whole rate)
+            http_limit: This scan's share of a shared HTTP client's connections, split
+                        between its validation processes (default: the client's whole limit)
+            distributed: Share the scan with other nodes through leased tasks in the database
+            enumerate_hosts: Run enumeration; False joins the target's current run and only
+                             validates leased tasks
+            join_timeout: Seconds to wait for that run to appear when not enumerating
+            metrics_file: JSON file the metrics summary is written to when the scan ends
+            report_metrics: Log the metrics summary when the scan ends. The registry is
+                            process-wide, so callers running several scans in one process
+                            turn this off and report once themselves
+        """
         if not target.startswith(('http://', 'https://')):
             target = f'https://{target}'
         self.target = target
-        self.logger = get_component_logger('scanner', include_id=True)
+        self.concurrency = concurrency
+        self.validation_rate = validation_rate
+        self.include_bruteforce = include_bruteforce
+        self.wordlist = wordlist
+        self.bruteforce_concurrency = bruteforce_concurrency
+        self.freshness_window = freshness_window
+        self.resume = resume
+        self.subprocess_slots = subprocess_slots
+        self.output_file = output_file
+        self.processes = processes
+        self.dns_rate = dns_rate
+        self.http_limit = http_limit
+        self.distributed = distributed
+        self.enumerate_hosts = enumerate_hosts
+        self.join_timeout = join_timeout
+        self.metrics_file = metrics_file
+        self.report_metrics = report_metrics
+        self.metrics_summary = None
+        self.resolver = resolver or CachingResolver()
+        self._owns_http_client = http_client is None
+        self.http_client = http_client or HTTPProbeClient(resolver=self.resolver, verify_ssl=verify_ssl)
+        self.id = uuid.uuid4()
+        self.logger = get_component_logger('scanner', instance_id=self.id)
         self.logger.info(f"Initialized SubdomainScanner for target: {target}")
 
     async def run_scan(self):
@@ -190,16 +691,39 @@ class SubdomainScanner:
         start_time = datetime.utcnow()
 
         try:
+            # Scans are checkpointed; init() is idempotent, so direct scan_target() calls work too
+            await db_manager.init()
+
             domain = urlparse(self.target).netloc
             self.logger.debug(f"Parsed domain: {domain}")
 
-            finder = SubdomainFinder(domain)
-            await finder.find_subdomains()
+            finder = SubdomainFinder(
+                domain,
+                concurrency=self.concurrency,
+                validation_rate=self.validation_rate,
+                resolver=self.resolver,
+                http_client=self.http_client,
+                include_bruteforce=self.include_bruteforce,
+                wordlist=self.wordlist,
+                bruteforce_concurrency=self.bruteforce_concurrency,
+                freshness_window=self.freshness_window,
+                checkpoint=True,
+                resume=self.resume,
+                subprocess_slots=self.subprocess_slots,
+                output_file=self.output_file,
+                processes=self.processes,
+                dns_rate=self.dns_rate,
+                http_limit=self.http_limit,
+                distributed=self.distributed,
+                enumerate_hosts=self.enumerate_hosts,
+                join_timeout=self.join_timeout
+            )
+            await metrics.measure('scan', finder.find_subdomains())
 
             end_time = datetime.utcnow()
             duration = (end_time - start_time).total_seconds()
             self.logger.info(f"Scan completed successfully in {duration:.2f} seconds")
-            self.logger.info(f"Results saved to {results_file}")
+            self.logger.info(f"Results saved to {db_manager.database_url}")
 
         except Exception as e:
             self.logger.error(
@@ -207,9 +731,25 @@ class SubdomainScanner:
                 f"Traceback: {traceback.format_exc()}"
             )
             raise
+        finally:
+            if self._owns_http_client:
+                await self.http_client.close()
+            self._report_metrics()
+
+    def _report_metrics(self):
+        """Log the process-wide metrics as JSON and write them to metrics_file if set"""
+        if not self.report_metrics:
+            return
+        self.metrics_summary = metrics.snapshot()
+        self.logger.info(f"Process metrics: {json.dumps(self.metrics_summary)}")
+        if self.metrics_file:
+            try:
+                metrics.write_json(self.metrics_file)
+            except OSError as e:
+                self.logger.warning(f"Could not write metrics to {self.metrics_file}: {str(e)}")
 
     @classmethod
-    async def scan_target(cls, target: str):
+    async def scan_target(cls, target: str, **kwargs):
         """Class method to create and run a scanner instance"""
-        scanner = cls(target)
+        scanner = cls(target, **kwargs)
         await scanner.run_scan()
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Optional
+
+from models.models import ScanRun
+from utils.database import db_manager
+from utils.dns_cache import CachingResolver
+from utils.http_client import HTTPProbeClient
+from utils.logging_config import get_component_logger
+from utils.metrics import metrics
+from utils.rate_limit import RateLimiter
+
+# Seconds between liveness checks while waiting on worker results
+POLL_INTERVAL = 0.5
+
+
+class QueueSink:
+    """
+    Result sink used inside worker processes.
+
+    Mirrors the two write methods SubdomainFinder calls on db_manager, but
+    sends the rows to the parent process, which owns the only database writer.
+    """
+
+    def __init__(self, result_queue):
+        self.result_queue = result_queue
+
+    async def save_subdomain(self, subdomain_data: dict):
+        self.result_queue.put(('subdomain', subdomain_data))
+
+    async def save_scan_task(self, scan_run_id: int, domain: str, source: str, state, sources=()):
+        self.result_queue.put(('task', (scan_run_id, domain, source, state, list(sources))))
+
+
+class _RecordDispatcher(logging.Handler):
+    """Hands log records from worker processes to the parent's logger of the same name"""
+
+    def handle(self, record):
+        logger = logging.getLogger(record.name)
+        if logger.isEnabledFor(record.levelno):
+            logger.handle(record)
+
+
+class ShardedValidator:
+    """
+    Validate a finder's hosts in a pool of worker processes.
+
+    Each worker runs its own event loop with a private resolver, HTTP client
+    and SubdomainFinder, pulling hosts from one bounded queue so the load
+    balances itself. Subdomain rows and task states stream back over a result
+    queue and are written by the parent through db_manager, so the database
+    still has exactly one batched writer. Each worker's metrics, freshness
+    skips and wildcard zones come back with its final message and are merged
+    into the parent's registry and finder.
+
+    The finder's budgets are split evenly between the workers: validation
+    concurrency and rate, the DNS query rate and the HTTP connection limit, so
+    N processes use what one would. Under a batch the DNS rate and connection
+    limit are the finder's share of the batch's, not the shared resolver's
+    and client's whole budget.
+    """
+
+    def __init__(self, finder, processes: int):
+        """
+        Args:
+            finder: SubdomainFinder whose hosts are validated; receives the results
+            processes: Number of worker processes
+        """
+        self.finder = finder
+        self.processes = processes
+        self._context = multiprocessing.get_context('spawn')
+        self._task_queue = self._context.Queue(maxsize=max(processes, finder.concurrency) * 2)
+        self._result_queue = self._context.Queue()
+        self._log_queue = self._context.Queue()
+        self._log_listener = QueueListener(self._log_queue, _RecordDispatcher())
+        self._listening = False
+        # One thread blocks on task queue puts, the other on result queue gets
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='shard-io')
+        self._workers: List[multiprocessing.Process] = []
+        self._writer: Optional[asyncio.Task] = None
+        self.logger = get_component_logger('sharding')
+
+    def start(self):
+        finder = self.finder
+        dns_rate = finder.dns_rate
+        if dns_rate is None and finder.resolver.rate_limiter is not None:
+            dns_rate = finder.resolver.rate_limiter.rate
+        http_limit = finder.http_limit if finder.http_limit is not None else finder.http_client.limit
+        config = {
+            'target': finder.target,
+            'scan_run_id': finder.scan_run.id if finder.scan_run is not None else None,
+            'known': finder.known,
+            'finder_kwargs': {
+                'concurrency': max(1, finder.concurrency // self.processes),
+                'validation_rate': self._share(finder.rate_limiter.rate),
+                'freshness_window': finder.freshness_window.total_seconds() if finder.freshness_window else None,
+                'recheck_fresh': finder.recheck_fresh,
+            },
+            'resolver_kwargs': finder.resolver.resolver_kwargs,
+            'dns_rate': self._share(dns_rate),
+            'http_limit': max(1, http_limit // self.processes),
+            'verify_ssl': finder.http_client.verify_ssl,
+            'port_overrides': finder.http_client.port_overrides,
+            'log_level': logging.getLogger().getEffectiveLevel(),
+        }
+
+        self._log_listener.start()
+        self._listening = True
+        for index in range(self.processes):
+            worker = self._context.Process(
+                target=_worker_process,
+                args=(index, config, self._task_queue, self._result_queue, self._log_queue),
+                name=f'validator-{index}',
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+        self._writer = asyncio.create_task(self._write_results())
+        self.logger.info(f"Started {self.processes} validation processes for {finder.target}")
+
+    async def submit(self, domain: str, source: str, sources: List[str]):
+        """Queue a host for the workers, waiting while the task queue is full"""
+        await self._put((domain, source, sources))
+
+    async def join(self):
+        """Tell the workers no more hosts are coming and wait until every result is written"""
+        for _ in self._workers:
+            await self._put(None)
+        await self._writer
+        for worker in self._workers:
+            await self._run_blocking(worker.join)
+
+    async def close(self):
+        """Stop the workers, killing any still running, and release the queues"""
+        if self._writer is not None and not self._writer.done():
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+        self._workers = []
+        # Nothing reads the queues any more; don't let their feeder threads block interpreter exit
+        self._task_queue.cancel_join_thread()
+        self._result_queue.cancel_join_thread()
+        if self._listening:
+            self._log_listener.stop()
+            self._listening = False
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _share(self, rate: Optional[float]) -> Optional[float]:
+        """One worker's share of a per-second rate; None stays unlimited"""
+        return rate / self.processes if rate else None
+
+    async def _run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _put(self, item):
+        """
+        Put item on the task queue, failing instead of blocking once the workers are gone.
+
+        Puts time out every POLL_INTERVAL so a full queue nobody drains never
+        pins an executor thread; in between, the result writer is checked and
+        its error re-raised.
+        """
+        while True:
+            if self._writer.done():
+                # Raises the writer's error; a writer that finished cleanly has no workers left
+                self._writer.result()
+                raise RuntimeError("Validation processes finished before every host was queued")
+            crashed = self._crashed_workers()
+            if crashed:
+                raise RuntimeError(f"Validation processes exited unexpectedly: {', '.join(crashed)}")
+            try:
+                await self._run_blocking(self._task_queue.put, item, True, POLL_INTERVAL)
+                return
+            except queue.Full:
+                continue
+
+    def _crashed_workers(self) -> List[str]:
+        return [worker.name for worker in self._workers if not worker.is_alive() and worker.exitcode != 0]
+
+    def _next_result(self):
+        try:
+            return self._result_queue.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            return None
+
+    async def _write_results(self):
+        """Persist rows sent by the workers until every worker reports it is done"""
+        finished = 0
+        while finished < len(self._workers):
+            item = await self._run_blocking(self._next_result)
+            if item is None:
+                crashed = self._crashed_workers()
+                if crashed:
+                    raise RuntimeError(f"Validation processes exited unexpectedly: {', '.join(crashed)}")
+                continue
+
+            kind, payload = item
+            if kind == 'subdomain':
+                self.finder.discovered.add(payload['domain'])
+                self.finder.results.append(payload)
+                await db_manager.save_subdomain(payload)
+            elif kind == 'task':
+                await db_manager.save_scan_task(*payload)
+            elif kind == 'done':
+                index, summary = payload
+                finished += 1
+                # Stage latencies, host counters and skips were recorded in the worker's own finder
+                metrics.merge(summary['metrics'])
+                self.finder.fresh_skipped += summary['fresh_skipped']
+                self.finder.wildcard_detector.add_fingerprints(summary['wildcard_fingerprints'])
+                self.logger.debug(f"Validation process {index} finished")
+
+
+def _worker_process(index: int, config: dict, task_queue, result_queue, log_queue):
+    """Entry point of a validation process"""
+    root_logger = logging.getLogger()
+    root_logger.handlers = [QueueHandler(log_queue)]
+    root_logger.setLevel(config['log_level'])
+    asyncio.run(_validate_shard(index, config, task_queue, result_queue))
+
+
+async def _validate_shard(index: int, config: dict, task_queue, result_queue):
+    # Imported here: the scanner module itself imports this one
+    from subfinder.scanner import SubdomainFinder
+
+    resolver = CachingResolver(rate_limiter=RateLimiter(config['dns_rate']), **config['resolver_kwargs'])
+    http_client = HTTPProbeClient(resolver=resolver, limit=config['http_limit'], verify_ssl=config['verify_ssl'],
+                                  port_overrides=config['port_overrides'])
+    finder = SubdomainFinder(
+        config['target'],
+        resolver=resolver,
+        http_client=http_client,
+        sink=QueueSink(result_queue),
+        **config['finder_kwargs']
+    )
+    finder.known = config['known']
+    if config['scan_run_id'] is not None:
+        finder.scan_run = ScanRun(id=config['scan_run_id'])
+
+    loop = asyncio.get_running_loop()
+
+    async def hosts():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            while True:
+                item = await loop.run_in_executor(executor, task_queue.get)
+                if item is None:
+                    return
+                yield item
+
+    try:
+        await finder.validate_hosts(hosts())
+    finally:
+        await http_client.close()
+    result_queue.put(('done', (index, {
+        'metrics': metrics.snapshot(buckets=True),
+        'fresh_skipped': finder.fresh_skipped,
+        'wildcard_fingerprints': finder.wildcard_detector.wildcard_fingerprints(),
+    })))
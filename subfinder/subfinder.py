@@ -2,7 +2,17 @@ import asyncio
 import json
 import logging
 import uuid
-from typing import List
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import AsyncIterator, List
+
+from utils.process import stop_process
+
+
+@dataclass
+class SubfinderResult:
+    host: str
+    source: str
 
 
 class Subfinder:
@@ -26,6 +36,23 @@ class Subfinder:
         self.output_json = json
         return self
 
+    def _build_command(self) -> List[str]:
+        cmd = [
+            'subfinder',
+            '-d', self.target,
+            '-silent',  # Minimize output
+            '-json'  # JSON output for reliable parsing
+        ]
+
+        if self.global_limit:
+            cmd.extend(['-rate-limit', str(self.global_limit)])
+
+        if self.output_file:
+            # Results are still parsed from stdout; the file is a copy for later use
+            cmd.extend(['-o', self.output_file])
+
+        return cmd
+
     async def run(self) -> List[str]:
         """
         Run subfinder against target domain and return discovered subdomains.
@@ -36,19 +63,39 @@ class Subfinder:
         Raises:
             Exception: If subfinder execution fails
         """
-        self.logger.info(f"Starting subfinder scan for: {self.target}")
-        
-        cmd = [
-            'subfinder',
-            '-d', self.target,
-            '-silent',  # Minimize output
-            '-json'  # JSON output for reliable parsing
-        ]
+        return [host async for host in self.stream()]
 
-        if self.global_limit:
-            cmd.extend(['-rate-limit', str(self.global_limit)])
+    async def stream(self) -> AsyncIterator[str]:
+        """
+        Run subfinder against target domain and yield subdomains as they are reported.
+
+        Hosts are yielded as soon as their JSON line arrives on stdout, so callers
+        can start validating while subfinder is still querying its sources. A host
+        reported by several sources is yielded once per source.
+
+        Yields:
+            Discovered subdomains
 
+        Raises:
+            Exception: If subfinder execution fails
+        """
+        async with aclosing(self.stream_results()) as results:
+            async for result in results:
+                yield result.host
 
+    async def stream_results(self) -> AsyncIterator[SubfinderResult]:
+        """
+        Run subfinder against target domain and yield each reported (host, source) pair.
+
+        Yields:
+            SubfinderResult for every JSON line subfinder prints
+
+        Raises:
+            Exception: If subfinder execution fails
+        """
+        self.logger.info(f"Starting subfinder scan for: {self.target}")
+
+        cmd = self._build_command()
         self.logger.debug(f"Executing command: {' '.join(cmd)}")
 
         try:
@@ -57,23 +104,22 @@ class Subfinder:
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE
             )
+        except FileNotFoundError:
+            self.logger.error("Subfinder binary not found in system PATH")
+            raise Exception("Subfinder binary not found")
 
-            stdout, stderr = await process.communicate()
-
-            if process.returncode != 0:
-                error_msg = stderr.decode()
-                self.logger.error(f"Subfinder execution failed: {error_msg}")
-                raise Exception(f"Subfinder failed: {error_msg}")
-
-            # Parse JSON output line by line
-            subdomains = []
-            stdout_text = stdout.decode()
-            self.logger.debug(f"Raw subfinder output: {stdout_text}")
+        # Drain stderr concurrently so a chatty subfinder can't block on a full pipe
+        stderr_task = asyncio.create_task(process.stderr.read())
+        count = 0
 
-            for line in stdout_text.splitlines():
+        try:
+            async for raw_line in process.stdout:
+                line = raw_line.decode(errors='replace').strip()
+                if not line:
+                    continue
                 try:
                     data = json.loads(line)
-                    subdomains.append(data['host'])
+                    host = data['host'].strip().lower().rstrip('.')
                 except json.JSONDecodeError:
                     self.logger.warning(f"Failed to parse JSON line: {line}")
                     continue
@@ -81,12 +127,21 @@ class Subfinder:
                     self.logger.warning(f"Missing 'host' key in JSON data: {line}")
                     continue
 
-            self.logger.info(f"Successfully discovered {len(subdomains)} subdomains")
-            return subdomains
+                count += 1
+                yield SubfinderResult(host=host, source=data.get('source', 'unknown'))
+
+            await process.wait()
+            stderr = await stderr_task
+
+            if process.returncode != 0:
+                error_msg = stderr.decode()
+                self.logger.error(f"Subfinder execution failed: {error_msg}")
+                raise Exception(f"Subfinder failed: {error_msg}")
+
+            self.logger.info(f"Successfully discovered {count} subdomain records")
 
-        except FileNotFoundError:
-            self.logger.error("Subfinder binary not found in system PATH")
-            raise Exception("Subfinder binary not found")
         except Exception as e:
             self.logger.error(f"Unexpected error during subfinder execution: {str(e)}")
             raise
+        finally:
+            await stop_process(process, stderr_task)
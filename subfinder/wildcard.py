@@ -0,0 +1,101 @@
+import asyncio
+import uuid
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+import aiodns
+
+from utils.logging_config import get_component_logger
+
+
+class WildcardDetector:
+    """
+    Detect wildcard DNS zones so phantom subdomains can skip expensive checks.
+
+    For every parent zone seen under the apex domain, a few random labels are
+    resolved once and their combined A answers are kept as the zone's
+    fingerprint. A host whose addresses all fall inside its parent zone's
+    fingerprint is indistinguishable from the wildcard and is treated as one.
+    """
+
+    def __init__(self, resolver, apex: str, samples: int = 3):
+        """
+        Args:
+            resolver: Resolver exposing aiodns-style ``query(name, rtype)``
+            apex: Apex domain; zones outside it are never fingerprinted
+            samples: Random labels resolved per zone
+        """
+        self.resolver = resolver
+        self.apex = apex.lower().rstrip('.')
+        self.samples = samples
+        self._fingerprints: Dict[str, FrozenSet[str]] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+        self.logger = get_component_logger('wildcard')
+
+    def parent_zone(self, domain: str) -> Optional[str]:
+        """Return the zone a wildcard for domain would live in, or None outside the apex"""
+        domain = domain.lower().rstrip('.')
+        if '.' not in domain or domain == self.apex:
+            return None
+        zone = domain.split('.', 1)[1]
+        if zone == self.apex or zone.endswith(f'.{self.apex}'):
+            return zone
+        return None
+
+    async def fingerprint(self, zone: str) -> FrozenSet[str]:
+        """Addresses answered for random labels under zone; empty when there is no wildcard"""
+        if zone in self._fingerprints:
+            return self._fingerprints[zone]
+
+        task = self._pending.get(zone)
+        if task is None:
+            task = asyncio.create_task(self._probe_zone(zone))
+            self._pending[zone] = task
+        return await asyncio.shield(task)
+
+    async def matches(self, domain: str, ip_addresses: Iterable[str]) -> bool:
+        """True when domain's addresses are fully explained by its zone's wildcard"""
+        ips = set(ip_addresses)
+        zone = self.parent_zone(domain)
+        if not ips or zone is None:
+            return False
+
+        fingerprint = await self.fingerprint(zone)
+        return bool(fingerprint) and ips <= fingerprint
+
+    @property
+    def wildcard_zones(self):
+        return sorted(zone for zone, fingerprint in self._fingerprints.items() if fingerprint)
+
+    def wildcard_fingerprints(self) -> Dict[str, List[str]]:
+        """Addresses of every wildcard zone found so far, in a picklable form"""
+        return {zone: sorted(fingerprint) for zone, fingerprint in self._fingerprints.items() if fingerprint}
+
+    def add_fingerprints(self, fingerprints: Dict[str, Iterable[str]]):
+        """Record fingerprints taken by another detector, e.g. in a validation process, for unprobed zones"""
+        for zone, addresses in fingerprints.items():
+            self._fingerprints.setdefault(zone, frozenset(addresses))
+
+    async def _probe_zone(self, zone: str) -> FrozenSet[str]:
+        try:
+            labels = [f"{uuid.uuid4().hex[:12]}.{zone}" for _ in range(self.samples)]
+            answers = await asyncio.gather(
+                *(self.resolver.query(label, 'A') for label in labels),
+                return_exceptions=True
+            )
+
+            addresses = set()
+            for answer in answers:
+                if isinstance(answer, aiodns.error.DNSError):
+                    continue
+                if isinstance(answer, Exception):
+                    self.logger.debug(f"Wildcard probe under {zone} failed: {str(answer)}")
+                    continue
+                addresses.update(record.host for record in answer)
+
+            fingerprint = frozenset(addresses)
+            if fingerprint:
+                self.logger.info(f"Wildcard DNS detected for *.{zone} -> {sorted(fingerprint)}")
+            self._fingerprints[zone] = fingerprint
+            return fingerprint
+        finally:
+            del self._pending[zone]
@@ -0,0 +1,20 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import db_manager  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Point db_manager at a fresh SQLite file for one test and restore it afterwards"""
+    original_url = db_manager.database_url
+    db_manager.database_url = f"sqlite+aiosqlite:///{tmp_path / 'scanner.db'}"
+    yield db_manager
+    if db_manager.engine is not None:
+        asyncio.run(db_manager.close())
+    db_manager.database_url = original_url
@@ -0,0 +1,184 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from models.models import ScanTask, ScanTaskState, Subdomain
+from subfinder.distributed import LeaseDispatcher
+from subfinder.scanner import SubdomainFinder
+
+
+async def start_run(database, domains):
+    """Record a fresh run with one pending task per domain"""
+    await database.init()
+    scan_run = await database.start_scan_run('example.com', resume=False)
+    for domain in domains:
+        await database.save_scan_task(scan_run.id, domain, 'PASSIVE', ScanTaskState.PENDING)
+    await database.flush()
+    return scan_run
+
+
+def claimed_domains(tasks):
+    return [domain for domain, _, _ in tasks]
+
+
+def test_concurrent_claimers_never_share_a_task(database):
+    domains = [f"host{index}.example.com" for index in range(60)]
+
+    async def scenario():
+        scan_run = await start_run(database, domains)
+        claims = {'a': [], 'b': []}
+
+        async def claimer(owner):
+            while True:
+                tasks = await database.claim_scan_tasks(scan_run.id, owner, 7, lease_seconds=300)
+                if not tasks:
+                    return
+                claims[owner].extend(claimed_domains(tasks))
+                await asyncio.sleep(0)
+
+        await asyncio.gather(claimer('a'), claimer('b'))
+        await database.close()
+        return claims
+
+    claims = asyncio.run(scenario())
+    assert claims['a'] and claims['b']
+    assert not set(claims['a']) & set(claims['b'])
+    assert sorted(claims['a'] + claims['b']) == sorted(domains)
+
+
+def test_expired_lease_is_reclaimed(database):
+    domains = ['a.example.com', 'b.example.com']
+
+    async def scenario():
+        scan_run = await start_run(database, domains)
+        first = await database.claim_scan_tasks(scan_run.id, 'dead-node', 10, lease_seconds=300)
+        async with database.session_scope() as session:
+            await session.execute(
+                update(ScanTask).values(lease_expires_at=datetime.utcnow() - timedelta(seconds=1))
+            )
+        second = await database.claim_scan_tasks(scan_run.id, 'live-node', 10, lease_seconds=300)
+        await database.close()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert sorted(claimed_domains(first)) == domains
+    assert sorted(claimed_domains(second)) == domains
+
+
+def test_unexpired_lease_is_left_alone(database):
+    async def scenario():
+        scan_run = await start_run(database, ['a.example.com', 'b.example.com'])
+        first = await database.claim_scan_tasks(scan_run.id, 'node-a', 1, lease_seconds=300)
+        second = await database.claim_scan_tasks(scan_run.id, 'node-b', 10, lease_seconds=300)
+        third = await database.claim_scan_tasks(scan_run.id, 'node-c', 10, lease_seconds=300)
+        await database.close()
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert claimed_domains(first) == ['a.example.com']
+    assert claimed_domains(second) == ['b.example.com']
+    assert third == []
+
+
+class RecordingFinder:
+    """Finder stand-in that marks every validated task done"""
+
+    def __init__(self, database, scan_run):
+        self.database = database
+        self.scan_run = scan_run
+        self.validated = []
+
+    async def validate_hosts(self, hosts):
+        async for domain, source, sources in hosts:
+            self.validated.append(domain)
+            await self.database.save_scan_task(self.scan_run.id, domain, source, ScanTaskState.DONE, sources)
+
+
+def test_claim_batches_stop_once_enumerated_and_drained(database):
+    async def scenario():
+        scan_run = await start_run(database, ['a.example.com', 'b.example.com'])
+        finder = RecordingFinder(database, scan_run)
+        dispatcher = LeaseDispatcher(finder, owner='node-a', batch_size=1, poll_interval=0.01)
+        dispatcher.start()
+
+        # Every task is done, but enumeration may still add more, so the claimer keeps polling
+        await asyncio.sleep(0.2)
+        polling = not dispatcher._claimer.done()
+
+        await database.update_scan_run(scan_run.id, enumeration_done=True)
+        await asyncio.wait_for(dispatcher.join(), timeout=5)
+        await database.close()
+        return finder, dispatcher, polling
+
+    finder, dispatcher, polling = asyncio.run(scenario())
+    assert polling
+    assert sorted(finder.validated) == ['a.example.com', 'b.example.com']
+    assert dispatcher.claimed == 2
+
+
+def test_worker_only_node_never_starts_a_run(database):
+    async def scenario():
+        await database.init()
+        finder = SubdomainFinder('example.com', distributed=True, enumerate_hosts=False, join_timeout=0.05)
+        error = None
+        try:
+            await finder._load_checkpoint()
+        except RuntimeError as e:
+            error = e
+        finally:
+            await finder.http_client.close()
+        running = await database.get_running_scan_run('example.com')
+        await database.close()
+        return error, running
+
+    error, running = asyncio.run(scenario())
+    assert 'No running scan of example.com' in str(error)
+    assert running is None
+
+
+def test_worker_only_node_joins_the_running_run(database):
+    async def scenario():
+        scan_run = await start_run(database, ['a.example.com'])
+        finder = SubdomainFinder('example.com', distributed=True, enumerate_hosts=False, join_timeout=0.05)
+        try:
+            unfinished = await finder._load_checkpoint()
+        finally:
+            await finder.http_client.close()
+        await database.close()
+        return scan_run, finder, unfinished
+
+    scan_run, finder, unfinished = asyncio.run(scenario())
+    assert finder.scan_run.id == scan_run.id
+    assert [domain for domain, _, _ in unfinished] == ['a.example.com']
+
+
+def test_enumerating_node_merges_late_sources_into_other_nodes_hosts(database):
+    async def scenario():
+        scan_run = await start_run(database, [])
+        # The enumerator queued the host on its first source, another node claimed and validated it
+        await database.save_scan_task(scan_run.id, 'a.example.com', 'PASSIVE', ScanTaskState.PENDING, ['crtsh'])
+        await database.flush()
+        claimed = await database.claim_scan_tasks(scan_run.id, 'node-b', 10, lease_seconds=300)
+        await database.save_subdomain({'domain': 'a.example.com', 'source': 'PASSIVE', 'sources': ['crtsh']})
+        await database.save_scan_task(scan_run.id, 'a.example.com', 'PASSIVE', ScanTaskState.DONE, ['crtsh'])
+
+        finder = SubdomainFinder('example.com', distributed=True)
+        finder.scan_run = scan_run
+        finder.sources = {'a.example.com': {'crtsh', 'virustotal', 'alienvault'}}
+        try:
+            await finder._save_task_sources()
+            await finder._save_late_sources()
+        finally:
+            await finder.http_client.close()
+
+        tasks = await database.load_scan_tasks(scan_run.id)
+        async with database.session_scope() as session:
+            stored = (await session.execute(select(Subdomain.sources))).scalars().all()
+        await database.close()
+        return claimed, tasks, stored
+
+    claimed, tasks, stored = asyncio.run(scenario())
+    assert claimed == [('a.example.com', 'PASSIVE', ['crtsh'])]
+    assert tasks[ScanTaskState.DONE] == [('a.example.com', 'PASSIVE', ['alienvault', 'crtsh', 'virustotal'])]
+    assert stored == [['alienvault', 'crtsh', 'virustotal']]
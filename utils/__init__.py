@@ -3,6 +3,6 @@ Utils package initialization.
 This package contains utility modules for the subdomain scanner application.
 """
 
-from .logging_config import setup_logging, get_logger, get_component_logger
+from .logging_config import setup_logging, get_logger, get_component_logger, LogSampler
 
-__all__ = ['setup_logging', 'get_logger', 'get_component_logger']
+__all__ = ['setup_logging', 'get_logger', 'get_component_logger', 'LogSampler']
@@ -0,0 +1,90 @@
+import hashlib
+import os
+import tempfile
+import threading
+import zlib
+from typing import Optional, Tuple, Union
+
+from utils.logging_config import get_component_logger
+
+DEFAULT_BLOB_DIR = "blobs"
+
+
+class BlobStore:
+    """
+    Content-addressed, compressed on-disk store for response bodies.
+
+    Each distinct body is stored once, zlib-compressed, under its SHA-256 in a
+    two-level fan-out directory (``ab/cd/abcd...``). Identical bodies served by
+    many URLs or hosts share one file, and callers keep only the hash and size.
+    put() may be called from worker threads.
+    """
+
+    def __init__(self, root: str = DEFAULT_BLOB_DIR, compression_level: int = 6):
+        """
+        Args:
+            root: Directory holding the blobs; created when missing
+            compression_level: zlib level, 1 (fastest) to 9 (smallest)
+        """
+        self.root = root
+        self.compression_level = compression_level
+        self.stored = 0
+        self.deduplicated = 0
+        self._known = set()  # hashes confirmed on disk, so repeats skip the stat
+        self._lock = threading.Lock()  # guards the counters and _known
+        os.makedirs(root, exist_ok=True)
+        self.logger = get_component_logger('blob_store')
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def put(self, data: Union[bytes, str]) -> Tuple[str, int]:
+        """
+        Store data unless an identical blob exists.
+
+        Returns:
+            (sha256 hex digest, uncompressed size in bytes)
+        """
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+
+        if digest in self._known or os.path.exists(self.path(digest)):
+            with self._lock:
+                self._known.add(digest)
+                self.deduplicated += 1
+            return digest, len(data)
+
+        path = self.path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial blob
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(zlib.compress(data, self.compression_level))
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        with self._lock:
+            self._known.add(digest)
+            self.stored += 1
+        return digest, len(data)
+
+    def get(self, digest: str) -> bytes:
+        """
+        Raises:
+            KeyError: If no blob is stored under digest
+        """
+        try:
+            with open(self.path(digest), 'rb') as f:
+                return zlib.decompress(f.read())
+        except FileNotFoundError:
+            raise KeyError(digest) from None
+
+    def get_text(self, digest: str, charset: Optional[str] = None) -> str:
+        return self.get(digest).decode(charset or 'utf-8', errors='replace')
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._known or os.path.exists(self.path(digest))
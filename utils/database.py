@@ -1,780 +1,590 @@
 import asyncio
-from dataclasses import dataclass
-import json
-from typing import List, Dict, Optional, Set
-from urllib.parse import urlparse
-import logging
-from pathlib import Path
-
-@dataclass
-class KatanaResult:
-    url: str
-    method: str
-    status_code: Optional[int]
-    content_type: Optional[str]
-    response_size: Optional[int]
-    parameters: Dict
-    headers: Dict
-    response_body: Optional[str]
-    source: str
-
-class KatanaCrawler:
-    def __init__(self, katana_path: str = "katana"):
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import UniqueConstraint, and_, bindparam, func, inspect, insert, or_, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from models.models import (
+    Base,
+    Endpoint,
+    EndpointSource,
+    JavaScript,
+    ScanRun,
+    ScanRunStatus,
+    ScanTask,
+    ScanTaskState,
+    Subdomain,
+    SubdomainSource,
+)
+from utils.logging_config import get_component_logger
+from utils.metrics import metrics
+
+DEFAULT_DATABASE_URL = "sqlite+aiosqlite:///scanner.db"
+
+# Dialects with a native INSERT ... ON CONFLICT, which buffered upserts rely on
+UPSERT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+class DatabaseManager:
+    """
+    Async database access built on SQLAlchemy's asyncio engine.
+
+    Writes are buffered per model and flushed as batched bulk inserts (or
+    upserts, for models with a natural key), either when ``batch_size`` rows
+    are pending or every ``flush_interval`` seconds, whichever comes first.
+    """
+
+    def __init__(self, database_url: str = DEFAULT_DATABASE_URL,
+                 batch_size: int = 500, flush_interval: float = 2.0,
+                 max_buffered_rows: int = 50_000):
         """
-        Initialize Katana crawler with path to binary and logger
-        
         Args:
-            katana_path: Path to katana binary. If just filename, must be in PATH.
-        Raises:
-            ValueError: If path contains suspicious characters
-            FileNotFoundError: If katana binary not found
-        """
-        if not self._is_safe_path(katana_path):
-            raise ValueError("Invalid katana path provided")
-            
-        self.katana_path = katana_path
-        self.logger = logging.getLogger(__name__)
-        self._validate_installation()
-        
-    def _is_safe_path(self, path: str) -> bool:
-        """
-        Validate path for suspicious characters or path traversal attempts
-        """
-        # Check for common shell special characters
-        dangerous_chars = ['|', '&', ';', "'"]
+            database_url: SQLAlchemy async URL (SQLite or PostgreSQL)
+            batch_size: Pending rows that trigger an immediate flush
+            flush_interval: Seconds between timed flushes
+            max_buffered_rows: Rows kept for retry while the database is failing;
+                               the oldest are dropped beyond this
+        """
+        self.database_url = database_url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered_rows = max_buffered_rows
+        self.engine = None
+        self.session_factory = None
+        # Rows are grouped by (model, conflict keys, preserved columns, row columns)
+        # so each group can be written with a single executemany statement
+        self._buffers: Dict[Tuple, List[dict]] = defaultdict(list)
+        self._pending_rows = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._size_flush: Optional[asyncio.Task] = None
+        self._retry_after = 0.0
+        self.logger = get_component_logger('database')
+        metrics.register_gauge('db_buffered_rows', lambda: self._pending_rows)
+
+    def _setup_engine(self):
+        """Create the async engine and session factory if not already created"""
+        if self.engine is not None:
+            return
+        self.logger.debug(f"Creating database engine for {self.database_url}")
+        self.engine = create_async_engine(self.database_url)
+        self.session_factory = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    async def init(self):
+        """Create or migrate tables and start the periodic flush task"""
+        if make_url(self.database_url).get_backend_name() not in UPSERT_INSERTS:
+            raise ValueError(
+                f"Unsupported database {self.database_url}: "
+                f"expected one of {', '.join(sorted(UPSERT_INSERTS))}"
+            )
+        self._setup_engine()
+
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(self._migrate)
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._periodic_flush())
+        self.logger.info("Database initialized")
+
+    async def close(self):
+        """Flush pending writes and release the engine"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        if self._size_flush is not None:
+            await asyncio.gather(self._size_flush, return_exceptions=True)
+            self._size_flush = None
+
+        await self.flush()
+
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+            self.session_factory = None
+
+    @asynccontextmanager
+    async def session_scope(self):
+        """Provide a transactional scope around a series of operations"""
+        self._setup_engine()
+        session = self.session_factory()
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
 
-    def _validate_installation(self):
-        """Validate katana installation"""
-        katana_path = Path(self.katana_path)
-        if not katana_path.exists():
-            self.logger.error(f"Katana binary not found at {self.katana_path}")
-            raise FileNotFoundError(f"Katana binary not found at {self.katana_path}")
+    async def save_subdomain(self, subdomain_data: dict):
+        """Buffer a subdomain record, upserted on its domain at the next flush"""
+        await self._add(
+            Subdomain,
+            self._subdomain_row(subdomain_data),
+            conflict_keys=('domain',),
+            preserve=('discovery_time',)
+        )
 
-    async def crawl_all(self, target_url: str) -> List[KatanaResult]:
-        """
-        Perform all types of crawling concurrently and return combined results
+    async def load_known_subdomains(self, apex: str) -> Dict[str, Tuple[Optional[datetime], List[str]]]:
         """
-        self.logger.info(f"Starting comprehensive crawl of {target_url}")
-        
-        tasks = [
-            self.crawl_endpoints(target_url),
-            self.crawl_js(target_url),
-            self.crawl_forms(target_url)
-        ]
-        
-        results = []
-        for completed_task in await asyncio.gather(*tasks, return_exceptions=True):
-            if isinstance(completed_task, Exception):
-                self.logger.error(f"Crawl task failed: {str(completed_task)}")
-                continue
-            results.extend(completed_task)
-        
-        self.logger.info(f"Comprehensive crawl completed. Found {len(results)} unique endpoints")
-        return self._deduplicate_results(results)
+        Load every stored host under apex in a single query.
 
-    async def crawl_endpoints(self, target_url: str) -> List[KatanaResult]:
-        """
-        Standard crawl optimized for endpoint discovery
-        """
-        self.logger.debug(f"Starting endpoint crawl for {target_url}")
-        cmd = [
-            self.katana_path,
-            "-u", target_url,
-            "-d", "3",
-            "-rl", "150",
-            "-c", "10",
-            "-j",
-            "-silent",
-            "-xhr"
-        ]
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "crawler") for r in results]
-        self.logger.debug(f"Endpoint crawl completed. Found {len(processed_results)} results")
-        return processed_results
-
-    async def crawl_js(self, target_url: str) -> List[KatanaResult]:
+        Returns:
+            Mapping of domain to (last_checked, ip_addresses)
         """
-        JavaScript-focused crawl
-        """
-        self.logger.debug(f"Starting JavaScript crawl for {target_url}")
-        cmd = [
-            self.katana_path,
-            "-u", target_url,
-            "-jc",
-            "-jsl",
-            "-d", "4",
-            "-j",
-            "-silent"
-        ]
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "javascript_parser") for r in results]
-        self.logger.debug(f"JavaScript crawl completed. Found {len(processed_results)} results")
-        return processed_results
-
-    async def crawl_forms(self, target_url: str) -> List[KatanaResult]:
-        """
-        Form-focused crawl
-        """
-        self.logger.debug(f"Starting form crawl for {target_url}")
-        cmd = [
-            self.katana_path,
-            "-u", target_url,
-            "-aff",
-            "-fx",
-            "-d", "3",
-            "-j",
-            "-silent"
-        ]
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "form_submission") for r in results]
-        self.logger.debug(f"Form crawl completed. Found {len(processed_results)} results")
-        return processed_results
-
-    async def custom_crawl(self, target_url: str, **kwargs) -> List[KatanaResult]:
-        """
-        Custom crawl with user-defined parameters
-        """
-        if not self._is_safe_url(target_url):
-            raise ValueError("Invalid target URL provided")
-            
-        self.logger.debug(f"Starting custom crawl for {target_url} with params: {kwargs}")
-        
-        # Validate and sanitize kwargs
-        sanitized_kwargs = self._sanitize_kwargs(kwargs)
-        cmd = [self.katana_path, "-u", target_url, "-silent", "-j"]
-        
-    def _is_safe_url(self, url: str) -> bool:
-        """
-        Validate URL for potential command injection or other security issues
+        statement = select(Subdomain.domain, Subdomain.last_checked, Subdomain.ip_addresses).where(
+            or_(Subdomain.domain == apex, Subdomain.domain.like(f'%.{apex}'))
+        )
+        async with self.session_scope() as session:
+            result = await session.execute(statement)
+            return {
+                domain: (last_checked, ip_addresses or [])
+                for domain, last_checked, ip_addresses in result
+            }
+
+    async def load_live_subdomains(self, apex: Optional[str] = None,
+                                   max_status: int = 500) -> List[Tuple[int, str, Optional[str]]]:
         """
-        if not url:
-            return False
-            
-        # Basic URL validation
-        try:
-            result = urlparse(url)
-            if not all([result.scheme, result.netloc]):
-                return False
-            # Only allow http/https schemes
-            if result.scheme not in ['http', 'https']:
-                return False
-        except Exception:
-            return False
-            
-        # Check for shell injection attempts
-        dangerous_chars = ['|', '&', ';', "'"]
-        
-        flag_mapping = {
-            "depth": "-d",
-            "concurrency": "-c",
-            "rate_limit": "-rl",
-            "timeout": "-timeout",
-            "delay": "-rd",
-            "js_crawl": "-jc",
-            "headless": "-hl",
-            "form_fill": "-aff"
-        }
-        
-        for key, value in kwargs.items():
-            if key in flag_mapping:
-                if isinstance(value, bool) and value:
-                    cmd.append(flag_mapping[key])
-                else:
-                    cmd.extend([flag_mapping[key], str(value)])
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "custom") for r in results]
-        self.logger.debug(f"Custom crawl completed. Found {len(processed_results)} results")
-        return processed_results
-
-    async def _execute_command(self, cmd: List[str]) -> List[Dict]:
-        """Execute katana command asynchronously and return parsed JSON results"""
-        try:
-            self.logger.debug(f"Executing command: {' '.join(cmd)}")
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                error_msg = stderr.decode()
-                self.logger.error(f"Katana command failed: {error_msg}")
-                raise RuntimeError(f"Katana command failed: {error_msg}")
-            
-            results = []
-            for line in stdout.decode().splitlines():
-                try:
-                    if line.strip():
-                        result = json.loads(line)
-                        results.append(result)
-                except json.JSONDecodeError as e:
-                    self.logger.warning(f"Failed to parse JSON line: {e}")
-                    continue
-                    
-            return results
-            
-        except Exception as e:
-            self.logger.error(f"Error executing katana: {str(e)}")
-            raise
+        Load live hosts worth crawling: alive, answering HTTP, and below max_status.
 
-    def _parse_result(self, result: Dict, source: str) -> KatanaResult:
-        """Convert raw katana result to KatanaResult object"""
-        try:
-            parsed_url = urlparse(result.get('url', ''))
-            
-            return KatanaResult(
-                url=result.get('url', ''),
-                method=result.get('method', 'GET'),
-                status_code=result.get('status-code'),
-                content_type=result.get('content-type'),
-                response_size=result.get('response-size'),
-                parameters={
-                    'query': parsed_url.query,
-                    'form_data': result.get('form_data', {})
-                },
-                headers=result.get('headers', {}),
-                response_body=result.get('response', None),
-                source=source
+        Args:
+            apex: Only hosts under this domain; every host when None
+            max_status: Hosts answering with this status or higher are left out
+
+        Returns:
+            (subdomain_id, domain, probed URL) tuples; the URL is None when the
+            probe details were not stored
+        """
+        statement = select(Subdomain.id, Subdomain.domain, Subdomain.additional_info).where(
+            Subdomain.is_alive.is_(True),
+            Subdomain.http_status.is_not(None),
+            Subdomain.http_status < max_status
+        )
+        if apex:
+            statement = statement.where(or_(Subdomain.domain == apex, Subdomain.domain.like(f'%.{apex}')))
+
+        async with self.session_scope() as session:
+            result = await session.execute(statement.order_by(Subdomain.id))
+            return [
+                (subdomain_id, domain, ((additional_info or {}).get('http') or {}).get('url'))
+                for subdomain_id, domain, additional_info in result
+            ]
+
+    async def load_subdomain_index(self, apex: Optional[str] = None) -> Dict[str, int]:
+        """
+        Map every stored host under apex (every host when None) to its subdomain id in one query
+        """
+        statement = select(Subdomain.domain, Subdomain.id)
+        if apex:
+            statement = statement.where(or_(Subdomain.domain == apex, Subdomain.domain.like(f'%.{apex}')))
+        async with self.session_scope() as session:
+            result = await session.execute(statement)
+            return {domain: subdomain_id for domain, subdomain_id in result}
+
+    async def save_endpoint(self, endpoint_data: dict):
+        """Buffer an endpoint row, upserted on (subdomain_id, path, method) at the next flush"""
+        row = dict(endpoint_data)
+        if isinstance(row.get('source'), str):
+            row['source'] = EndpointSource(row['source'])
+        # NULLs never conflict in a unique index, so the method is always set
+        row['method'] = (row.get('method') or 'GET').upper()
+        await self._add(
+            Endpoint,
+            row,
+            conflict_keys=('subdomain_id', 'path', 'method'),
+            preserve=('discovery_time',)
+        )
+
+    async def save_javascript(self, javascript_data: dict):
+        """Buffer a javascript_files row, upserted on (subdomain_id, url) at the next flush"""
+        await self._add(
+            JavaScript,
+            dict(javascript_data),
+            conflict_keys=('subdomain_id', 'url'),
+            preserve=('discovery_time',)
+        )
+
+    async def load_javascript_hashes(self) -> Set[str]:
+        """Hashes of every script analyzed so far"""
+        async with self.session_scope() as session:
+            result = await session.execute(
+                select(JavaScript.file_hash).where(JavaScript.file_hash.is_not(None)).distinct()
             )
-        except Exception as e:
-            self.logger.error(f"Error parsing result: {str(e)}")
-            raise
+            return set(result.scalars())
 
-    def _deduplicate_results(self, results: List[KatanaResult]) -> List[KatanaResult]:
-        """Remove duplicate results based on URL and method"""
-        seen = set()
-        unique_results = []
-        
-        for result in results:
-            key = (result.url, result.method)
-            if key not in seen:
-                seen.add(key)
-                unique_results.append(result)
-        
-        return unique_results
-
-
-        dangerous_chars = [",", '>', '<', '`', '\\']
-        if any(char in path for char in dangerous_chars):
-            self.logger.error(f"Dangerous characters detected in path: {path}")
-            return False
-            
-        # Check for path traversal attempts
-        normalized = str(Path(path).resolve())
-        if '..' in path or '//' in path:
-            self.logger.error(f"Potential path traversal detected in: {path}")
-            return False
-            
-        return True
-
-    def _validate_installation(self):
-        """Validate katana installation"""
-        katana_path = Path(self.katana_path)
-        if not katana_path.exists():
-            self.logger.error(f"Katana binary not found at {self.katana_path}")
-            raise FileNotFoundError(f"Katana binary not found at {self.katana_path}")
-
-    async def crawl_all(self, target_url: str) -> List[KatanaResult]:
+    async def load_javascript_analysis(
+            self, file_hash: str) -> Optional[Tuple[List[str], Dict[str, List[str]]]]:
         """
-        Perform all types of crawling concurrently and return combined results
-        """
-        self.logger.info(f"Starting comprehensive crawl of {target_url}")
-        
-        tasks = [
-            self.crawl_endpoints(target_url),
-            self.crawl_js(target_url),
-            self.crawl_forms(target_url)
-        ]
-        
-        results = []
-        for completed_task in await asyncio.gather(*tasks, return_exceptions=True):
-            if isinstance(completed_task, Exception):
-                self.logger.error(f"Crawl task failed: {str(completed_task)}")
-                continue
-            results.extend(completed_task)
-        
-        self.logger.info(f"Comprehensive crawl completed. Found {len(results)} unique endpoints")
-        return self._deduplicate_results(results)
+        Stored analysis of a script by hash.
 
-    async def crawl_endpoints(self, target_url: str) -> List[KatanaResult]:
-        """
-        Standard crawl optimized for endpoint discovery
-        """
-        self.logger.debug(f"Starting endpoint crawl for {target_url}")
-        cmd = [
-            self.katana_path,
-            "-u", target_url,
-            "-d", "3",
-            "-rl", "150",
-            "-c", "10",
-            "-j",
-            "-silent",
-            "-xhr"
-        ]
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "crawler") for r in results]
-        self.logger.debug(f"Endpoint crawl completed. Found {len(processed_results)} results")
-        return processed_results
-
-    async def crawl_js(self, target_url: str) -> List[KatanaResult]:
-        """
-        JavaScript-focused crawl
+        Returns:
+            (endpoints_referenced, variables), or None when the hash is unknown
         """
-        self.logger.debug(f"Starting JavaScript crawl for {target_url}")
-        cmd = [
-            self.katana_path,
-            "-u", target_url,
-            "-jc",
-            "-jsl",
-            "-d", "4",
-            "-j",
-            "-silent"
-        ]
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "javascript_parser") for r in results]
-        self.logger.debug(f"JavaScript crawl completed. Found {len(processed_results)} results")
-        return processed_results
-
-    async def crawl_forms(self, target_url: str) -> List[KatanaResult]:
-        """
-        Form-focused crawl
-        """
-        self.logger.debug(f"Starting form crawl for {target_url}")
-        cmd = [
-            self.katana_path,
-            "-u", target_url,
-            "-aff",
-            "-fx",
-            "-d", "3",
-            "-j",
-            "-silent"
-        ]
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "form_submission") for r in results]
-        self.logger.debug(f"Form crawl completed. Found {len(processed_results)} results")
-        return processed_results
-
-    async def custom_crawl(self, target_url: str, **kwargs) -> List[KatanaResult]:
-        """
-        Custom crawl with user-defined parameters
-        """
-        self.logger.debug(f"Starting custom crawl for {target_url} with params: {kwargs}")
-        cmd = [self.katana_path, "-u", target_url, "-silent", "-j"]
-        
-        flag_mapping = {
-            "depth": "-d",
-            "concurrency": "-c",
-            "rate_limit": "-rl",
-            "timeout": "-timeout",
-            "delay": "-rd",
-            "js_crawl": "-jc",
-            "headless": "-hl",
-            "form_fill": "-aff"
-        }
-        
-        for key, value in kwargs.items():
-            if key in flag_mapping:
-                if isinstance(value, bool) and value:
-                    cmd.append(flag_mapping[key])
-                else:
-                    cmd.extend([flag_mapping[key], str(value)])
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "custom") for r in results]
-        self.logger.debug(f"Custom crawl completed. Found {len(processed_results)} results")
-        return processed_results
-
-    async def _execute_command(self, cmd: List[str]) -> List[Dict]:
-        """Execute katana command asynchronously and return parsed JSON results"""
-        try:
-            self.logger.debug(f"Executing command: {' '.join(cmd)}")
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                error_msg = stderr.decode()
-                self.logger.error(f"Katana command failed: {error_msg}")
-                raise RuntimeError(f"Katana command failed: {error_msg}")
-            
-            results = []
-            for line in stdout.decode().splitlines():
-                try:
-                    if line.strip():
-                        result = json.loads(line)
-                        results.append(result)
-                except json.JSONDecodeError as e:
-                    self.logger.warning(f"Failed to parse JSON line: {e}")
-                    continue
-                    
-            return results
-            
-        except Exception as e:
-            self.logger.error(f"Error executing katana: {str(e)}")
-            raise
-
-    def _parse_result(self, result: Dict, source: str) -> KatanaResult:
-        """Convert raw katana result to KatanaResult object"""
-        try:
-            parsed_url = urlparse(result.get('url', ''))
-            
-            return KatanaResult(
-                url=result.get('url', ''),
-                method=result.get('method', 'GET'),
-                status_code=result.get('status-code'),
-                content_type=result.get('content-type'),
-                response_size=result.get('response-size'),
-                parameters={
-                    'query': parsed_url.query,
-                    'form_data': result.get('form_data', {})
-                },
-                headers=result.get('headers', {}),
-                response_body=result.get('response', None),
-                source=source
+        async with self.session_scope() as session:
+            result = await session.execute(
+                select(JavaScript.endpoints_referenced, JavaScript.variables)
+                .where(JavaScript.file_hash == file_hash)
+                .limit(1)
             )
-        except Exception as e:
-            self.logger.error(f"Error parsing result: {str(e)}")
-            raise
+            row = result.first()
+            if row is None:
+                return None
+            return row.endpoints_referenced or [], row.variables or {}
 
-    def _deduplicate_results(self, results: List[KatanaResult]) -> List[KatanaResult]:
-        """Remove duplicate results based on URL and method"""
-        seen = set()
-        unique_results = []
-        
-        for result in results:
-            key = (result.url, result.method)
-            if key not in seen:
-                seen.add(key)
-                unique_results.append(result)
-        
-        return unique_results
-
-
-        dangerous_chars = [",", '>', '<', '`', '\\']
-        if any(char in url for char in dangerous_chars):
-            return False
-            
-        return True
-        
-    def _sanitize_kwargs(self, kwargs: Dict) -> Dict:
-        """
-        Sanitize and validate custom crawl parameters
+    async def start_scan_run(self, target: str, resume: bool = True) -> ScanRun:
         """
-        allowed_keys = {
-            "depth": int,
-            "concurrency": int,
-            "rate_limit": int,
-            "timeout": int,
-            "delay": int,
-            "js_crawl": bool,
-            "headless": bool,
-            "form_fill": bool
-        }
-        
-        flag_mapping = {
-            "depth": "-d",
-            "concurrency": "-c",
-            "rate_limit": "-rl",
-            "timeout": "-timeout",
-            "delay": "-rd",
-            "js_crawl": "-jc",
-            "headless": "-hl",
-            "form_fill": "-aff"
-        }
-        
-        for key, value in kwargs.items():
-            if key in flag_mapping:
-                if isinstance(value, bool) and value:
-                    cmd.append(flag_mapping[key])
-                else:
-                    cmd.extend([flag_mapping[key], str(value)])
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "custom") for r in results]
-        self.logger.debug(f"Custom crawl completed. Found {len(processed_results)} results")
-        return processed_results
-
-    async def _execute_command(self, cmd: List[str]) -> List[Dict]:
-        """Execute katana command asynchronously and return parsed JSON results"""
-        try:
-            self.logger.debug(f"Executing command: {' '.join(cmd)}")
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+        Return the latest unfinished run for target, or record a new one.
+
+        Args:
+            target: Apex domain being scanned
+            resume: Pick up an unfinished run; when False a fresh run is always started
+        """
+        if resume:
+            scan_run = await self.get_running_scan_run(target)
+            if scan_run is not None:
+                self.logger.info(f"Resuming scan run {scan_run.id} for {target}")
+                return scan_run
+
+        async with self.session_scope() as session:
+            scan_run = ScanRun(target=target, status=ScanRunStatus.RUNNING, started_at=datetime.utcnow())
+            session.add(scan_run)
+            await session.flush()
+            self.logger.info(f"Started scan run {scan_run.id} for {target}")
+            return scan_run
+
+    async def update_scan_run(self, scan_run_id: int, **values):
+        """
+        Flush buffered writes, then update the run record.
+
+        Flushing first guarantees a checkpoint never claims more progress than
+        the task rows already written.
+        """
+        await self.flush()
+        async with self.session_scope() as session:
+            await session.execute(update(ScanRun).where(ScanRun.id == scan_run_id).values(**values))
+
+    async def save_scan_task(self, scan_run_id: int, domain: str, source: str, state: ScanTaskState,
+                             sources: Sequence[str] = ()):
+        """Buffer a task state change, upserted on (scan_run_id, domain) at the next flush"""
+        # Every task row has the same columns, so all changes land in one buffer
+        # and are applied in the order they were made
+        await self._add(
+            ScanTask,
+            {
+                'scan_run_id': scan_run_id,
+                'domain': domain,
+                'source': SubdomainSource[source],
+                'sources': list(sources),
+                'state': state,
+                'updated_at': datetime.utcnow(),
+            },
+            conflict_keys=('scan_run_id', 'domain')
+        )
+
+    async def update_scan_task_sources(self, scan_run_id: int, sources: Dict[str, Sequence[str]]):
+        """Flush buffered writes, then replace the sources recorded on the run's tasks, by domain"""
+        table = ScanTask.__table__
+        await self._update_sources(
+            update(table)
+            .where(table.c.scan_run_id == scan_run_id, table.c.domain == bindparam('b_domain'))
+            .values(sources=bindparam('b_sources')),
+            sources
+        )
+
+    async def update_subdomain_sources(self, sources: Dict[str, Sequence[str]]):
+        """Flush buffered writes, then replace the sources of stored subdomains, by domain"""
+        table = Subdomain.__table__
+        await self._update_sources(
+            update(table).where(table.c.domain == bindparam('b_domain')).values(sources=bindparam('b_sources')),
+            sources
+        )
+
+    async def _update_sources(self, statement, sources: Dict[str, Sequence[str]]):
+        if not sources:
+            return
+        # Flushing first makes sure the rows being updated have been written
+        await self.flush()
+        async with self.session_scope() as session:
+            await session.execute(
+                statement,
+                [{'b_domain': domain, 'b_sources': list(domain_sources)}
+                 for domain, domain_sources in sources.items()]
             )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                error_msg = stderr.decode()
-                self.logger.error(f"Katana command failed: {error_msg}")
-                raise RuntimeError(f"Katana command failed: {error_msg}")
-            
-            results = []
-            for line in stdout.decode().splitlines():
-                try:
-                    if line.strip():
-                        result = json.loads(line)
-                        results.append(result)
-                except json.JSONDecodeError as e:
-                    self.logger.warning(f"Failed to parse JSON line: {e}")
-                    continue
-                    
-            return results
-            
-        except Exception as e:
-            self.logger.error(f"Error executing katana: {str(e)}")
-            raise
 
-    def _parse_result(self, result: Dict, source: str) -> KatanaResult:
-        """Convert raw katana result to KatanaResult object"""
-        try:
-            parsed_url = urlparse(result.get('url', ''))
-            
-            return KatanaResult(
-                url=result.get('url', ''),
-                method=result.get('method', 'GET'),
-                status_code=result.get('status-code'),
-                content_type=result.get('content-type'),
-                response_size=result.get('response-size'),
-                parameters={
-                    'query': parsed_url.query,
-                    'form_data': result.get('form_data', {})
-                },
-                headers=result.get('headers', {}),
-                response_body=result.get('response', None),
-                source=source
+    async def load_scan_tasks(self, scan_run_id: int) -> Dict[ScanTaskState, List[Tuple[str, str, List[str]]]]:
+        """Return the run's (domain, source name, sources) tasks grouped by state"""
+        tasks = {state: [] for state in ScanTaskState}
+        async with self.session_scope() as session:
+            result = await session.execute(
+                select(ScanTask.domain, ScanTask.source, ScanTask.sources, ScanTask.state)
+                .where(ScanTask.scan_run_id == scan_run_id)
             )
-        except Exception as e:
-            self.logger.error(f"Error parsing result: {str(e)}")
-            raise
+            for domain, source, sources, state in result:
+                tasks[state].append((domain, source.name, sources or []))
+        return tasks
+
+    async def get_running_scan_run(self, target: str) -> Optional[ScanRun]:
+        """Latest unfinished run for target, or None"""
+        async with self.session_scope() as session:
+            result = await session.execute(
+                select(ScanRun)
+                .where(ScanRun.target == target, ScanRun.status == ScanRunStatus.RUNNING)
+                .order_by(ScanRun.id.desc())
+                .limit(1)
+            )
+            return result.scalar_one_or_none()
+
+    async def get_scan_run(self, scan_run_id: int) -> Optional[ScanRun]:
+        async with self.session_scope() as session:
+            return await session.get(ScanRun, scan_run_id)
+
+    async def claim_scan_tasks(self, scan_run_id: int, owner: str, limit: int,
+                               lease_seconds: float) -> List[Tuple[str, str, List[str]]]:
+        """
+        Lease up to limit open tasks of a run to owner.
+
+        Pending tasks are claimable, and so are in-flight tasks whose lease has
+        expired (their node died or stalled). The claim is a single
+        UPDATE ... RETURNING, and the claimable condition is checked again on
+        the updated rows, so two nodes never get the same task from one round.
+
+        Returns:
+            (domain, source name, sources) for every claimed task
+        """
+        now = datetime.utcnow()
+        claimable = and_(
+            ScanTask.scan_run_id == scan_run_id,
+            or_(
+                ScanTask.state == ScanTaskState.PENDING,
+                and_(
+                    ScanTask.state == ScanTaskState.IN_FLIGHT,
+                    or_(ScanTask.lease_expires_at.is_(None), ScanTask.lease_expires_at < now)
+                )
+            )
+        )
+        candidates = (
+            select(ScanTask.id)
+            .where(claimable)
+            .order_by(ScanTask.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        statement = (
+            update(ScanTask)
+            .where(ScanTask.id.in_(candidates), claimable)
+            .values(
+                state=ScanTaskState.IN_FLIGHT,
+                lease_owner=owner,
+                lease_expires_at=now + timedelta(seconds=lease_seconds),
+                updated_at=now
+            )
+            .returning(ScanTask.domain, ScanTask.source, ScanTask.sources)
+            .execution_options(synchronize_session=False)
+        )
+        async with self.session_scope() as session:
+            result = await session.execute(statement)
+            return [(domain, source.name, sources or []) for domain, source, sources in result]
+
+    async def count_open_scan_tasks(self, scan_run_id: int) -> int:
+        """Tasks of a run that are not done yet"""
+        async with self.session_scope() as session:
+            result = await session.execute(
+                select(func.count(ScanTask.id))
+                .where(ScanTask.scan_run_id == scan_run_id, ScanTask.state != ScanTaskState.DONE)
+            )
+            return result.scalar_one()
+
+    async def flush(self):
+        """
+        Write all buffered rows, one bulk statement per row group, in a single transaction.
+
+        If the write fails the rows are put back at the front of the buffers so
+        the next flush retries them, and the error is re-raised.
+        """
+        async with self._flush_lock:
+            if not self._pending_rows:
+                return
+            buffers, self._buffers = self._buffers, defaultdict(list)
+            row_count, self._pending_rows = self._pending_rows, 0
+
+            try:
+                with metrics.timer('db_write'):
+                    async with self.session_scope() as session:
+                        for (model, conflict_keys, preserve, columns), rows in buffers.items():
+                            statement = self._insert_statement(model, conflict_keys, preserve, columns)
+                            await session.execute(statement, rows)
+                metrics.inc('db_rows_written', row_count)
+                self.logger.debug(f"Flushed {row_count} rows to the database")
+                self._retry_after = 0.0
+            except Exception as e:
+                self._restore(buffers, row_count)
+                self._retry_after = time.monotonic() + self.flush_interval
+                self.logger.error(
+                    f"Failed to flush {row_count} rows to the database, keeping them for retry: {str(e)}"
+                )
+                raise
+
+    def _restore(self, buffers: Dict[Tuple, List[dict]], row_count: int):
+        """Put rows from a failed flush back ahead of anything buffered since"""
+        for key, rows in self._buffers.items():
+            buffers[key].extend(rows)
+        self._buffers = buffers
+        self._pending_rows += row_count
+
+        overflow = self._pending_rows - self.max_buffered_rows
+        if overflow <= 0:
+            return
+        self.logger.error(f"Database write buffer full, dropping {overflow} oldest rows")
+        for rows in self._buffers.values():
+            dropped = min(overflow, len(rows))
+            del rows[:dropped]
+            self._pending_rows -= dropped
+            overflow -= dropped
+            if not overflow:
+                break
+
+    async def _add(self, model: type, row: dict, conflict_keys: Sequence[str] = (),
+                   preserve: Sequence[str] = ()):
+        """
+        Buffer a row for model.
+
+        Reaching batch_size starts one background flush unless one is already
+        running, so writers don't queue up on the flush lock, each committing a
+        handful of rows. Callers only wait for it once max_buffered_rows pile up
+        behind it. A failed size-triggered flush is not raised to the caller: the
+        rows stay buffered and are retried by the periodic flush.
 
-    def _deduplicate_results(self, results: List[KatanaResult]) -> List[KatanaResult]:
-        """Remove duplicate results based on URL and method"""
-        seen = set()
-        unique_results = []
-        
-        for result in results:
-            key = (result.url, result.method)
-            if key not in seen:
-                seen.add(key)
-                unique_results.append(result)
-        
-        return unique_results
-
-
-        dangerous_chars = [",", '>', '<', '`', '\\']
-        if any(char in path for char in dangerous_chars):
-            self.logger.error(f"Dangerous characters detected in path: {path}")
-            return False
-            
-        # Check for path traversal attempts
-        normalized = str(Path(path).resolve())
-        if '..' in path or '//' in path:
-            self.logger.error(f"Potential path traversal detected in: {path}")
-            return False
-            
-        return True
-
-    def _validate_installation(self):
-        """Validate katana installation"""
-        katana_path = Path(self.katana_path)
-        if not katana_path.exists():
-            self.logger.error(f"Katana binary not found at {self.katana_path}")
-            raise FileNotFoundError(f"Katana binary not found at {self.katana_path}")
-
-    async def crawl_all(self, target_url: str) -> List[KatanaResult]:
+        Args:
+            conflict_keys: Unique columns to upsert on; plain insert when empty
+            preserve: Columns kept from the existing row when upserting
+        """
+        key = (model, tuple(conflict_keys), tuple(preserve), tuple(sorted(row)))
+        self._buffers[key].append(row)
+        self._pending_rows += 1
+        if self._pending_rows < self.batch_size or time.monotonic() < self._retry_after:
+            return
+
+        flushing = self._size_flush is not None and not self._size_flush.done()
+        if not flushing and not self._flush_lock.locked():
+            self._size_flush = asyncio.create_task(self._flush_quietly())
+        elif flushing and self._pending_rows >= self.max_buffered_rows:
+            # The database can't keep up; hold writers until the running flush is done
+            await asyncio.wait({self._size_flush})
+
+    def _insert_statement(self, model: type, conflict_keys: Tuple[str, ...],
+                          preserve: Tuple[str, ...], columns: Tuple[str, ...]):
+        if not conflict_keys:
+            return insert(model)
+
+        statement = UPSERT_INSERTS[self.engine.dialect.name](model)
+
+        updates = {
+            column: statement.excluded[column]
+            for column in columns
+            if column not in conflict_keys and column not in preserve
+        }
+        if not updates:
+            return statement.on_conflict_do_nothing(index_elements=list(conflict_keys))
+        return statement.on_conflict_do_update(index_elements=list(conflict_keys), set_=updates)
+
+    def _migrate(self, conn):
         """
-        Perform all types of crawling concurrently and return combined results
+        Bring tables created by older versions up to the current models.
+
+        create_all() never alters existing tables, so missing columns are added
+        and missing unique indexes created here. Duplicate rows are collapsed to
+        the most recent one first, otherwise the unique index can't be built.
         """
-        self.logger.info(f"Starting comprehensive crawl of {target_url}")
-        
-        tasks = [
-            self.crawl_endpoints(target_url),
-            self.crawl_js(target_url),
-            self.crawl_forms(target_url)
-        ]
-        
-        results = []
-        for completed_task in await asyncio.gather(*tasks, return_exceptions=True):
-            if isinstance(completed_task, Exception):
-                self.logger.error(f"Crawl task failed: {str(completed_task)}")
+        inspector = inspect(conn)
+        existing_tables = set(inspector.get_table_names())
+
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
                 continue
-            results.extend(completed_task)
-        
-        self.logger.info(f"Comprehensive crawl completed. Found {len(results)} unique endpoints")
-        return self._deduplicate_results(results)
 
-    async def crawl_endpoints(self, target_url: str) -> List[KatanaResult]:
-        """
-        Standard crawl optimized for endpoint discovery
-        """
-        self.logger.debug(f"Starting endpoint crawl for {target_url}")
-        cmd = [
-            self.katana_path,
-            "-u", target_url,
-            "-d", "3",
-            "-rl", "150",
-            "-c", "10",
-            "-j",
-            "-silent",
-            "-xhr"
-        ]
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "crawler") for r in results]
-        self.logger.debug(f"Endpoint crawl completed. Found {len(processed_results)} results")
-        return processed_results
-
-    async def crawl_js(self, target_url: str) -> List[KatanaResult]:
-        """
-        JavaScript-focused crawl
-        """
-        self.logger.debug(f"Starting JavaScript crawl for {target_url}")
-        cmd = [
-            self.katana_path,
-            "-u", target_url,
-            "-jc",
-            "-jsl",
-            "-d", "4",
-            "-j",
-            "-silent"
-        ]
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "javascript_parser") for r in results]
-        self.logger.debug(f"JavaScript crawl completed. Found {len(processed_results)} results")
-        return processed_results
-
-    async def crawl_forms(self, target_url: str) -> List[KatanaResult]:
-        """
-        Form-focused crawl
-        """
-        self.logger.debug(f"Starting form crawl for {target_url}")
-        cmd = [
-            self.katana_path,
-            "-u", target_url,
-            "-aff",
-            "-fx",
-            "-d", "3",
-            "-j",
-            "-silent"
-        ]
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "form_submission") for r in results]
-        self.logger.debug(f"Form crawl completed. Found {len(processed_results)} results")
-        return processed_results
-
-    async def custom_crawl(self, target_url: str, **kwargs) -> List[KatanaResult]:
-        """
-        Custom crawl with user-defined parameters
-        """
-        self.logger.debug(f"Starting custom crawl for {target_url} with params: {kwargs}")
-        cmd = [self.katana_path, "-u", target_url, "-silent", "-j"]
-        
-        flag_mapping = {
-            "depth": "-d",
-            "concurrency": "-c",
-            "rate_limit": "-rl",
-            "timeout": "-timeout",
-            "delay": "-rd",
-            "js_crawl": "-jc",
-            "headless": "-hl",
-            "form_fill": "-aff"
-        }
-        
-        for key, value in kwargs.items():
-            if key in flag_mapping:
-                if isinstance(value, bool) and value:
-                    cmd.append(flag_mapping[key])
-                else:
-                    cmd.extend([flag_mapping[key], str(value)])
-        
-        results = await self._execute_command(cmd)
-        processed_results = [self._parse_result(r, "custom") for r in results]
-        self.logger.debug(f"Custom crawl completed. Found {len(processed_results)} results")
-        return processed_results
-
-    async def _execute_command(self, cmd: List[str]) -> List[Dict]:
-        """Execute katana command asynchronously and return parsed JSON results"""
-        try:
-            self.logger.debug(f"Executing command: {' '.join(cmd)}")
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                error_msg = stderr.decode()
-                self.logger.error(f"Katana command failed: {error_msg}")
-                raise RuntimeError(f"Katana command failed: {error_msg}")
-            
-            results = []
-            for line in stdout.decode().splitlines():
-                try:
-                    if line.strip():
-                        result = json.loads(line)
-                        results.append(result)
-                except json.JSONDecodeError as e:
-                    self.logger.warning(f"Failed to parse JSON line: {e}")
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
                     continue
-                    
-            return results
-            
-        except Exception as e:
-            self.logger.error(f"Error executing katana: {str(e)}")
-            raise
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                self.logger.info(f"Added column {table.name}.{column.name}")
+
+            unique_sets = {
+                frozenset(index['column_names'])
+                for index in inspector.get_indexes(table.name) if index.get('unique')
+            }
+            unique_sets.update(
+                frozenset(constraint['column_names'])
+                for constraint in inspector.get_unique_constraints(table.name)
+            )
 
-    def _parse_result(self, result: Dict, source: str) -> KatanaResult:
-        """Convert raw katana result to KatanaResult object"""
+            for columns in self._unique_column_sets(table):
+                if frozenset(columns) in unique_sets:
+                    continue
+                column_list = ', '.join(columns)
+                if 'id' in table.columns:
+                    result = conn.execute(text(
+                        f'DELETE FROM {table.name} WHERE id NOT IN '
+                        f'(SELECT MAX(id) FROM {table.name} GROUP BY {column_list})'
+                    ))
+                    if result.rowcount:
+                        self.logger.info(f"Removed {result.rowcount} duplicate rows from {table.name}")
+                index_name = f"uq_{table.name}_{'_'.join(columns)}"
+                conn.execute(text(f'CREATE UNIQUE INDEX {index_name} ON {table.name} ({column_list})'))
+                unique_sets.add(frozenset(columns))
+                self.logger.info(f"Created unique index {index_name}")
+
+    @staticmethod
+    def _unique_column_sets(table) -> List[Tuple[str, ...]]:
+        column_sets = [(column.name,) for column in table.columns if column.unique]
+        column_sets.extend(
+            tuple(column.name for column in constraint.columns)
+            for constraint in table.constraints if isinstance(constraint, UniqueConstraint)
+        )
+        return list(dict.fromkeys(column_sets))
+
+    async def _periodic_flush(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._flush_quietly()
+
+    async def _flush_quietly(self):
         try:
-            parsed_url = urlparse(result.get('url', ''))
-            
-            return KatanaResult(
-                url=result.get('url', ''),
-                method=result.get('method', 'GET'),
-                status_code=result.get('status-code'),
-                content_type=result.get('content-type'),
-                response_size=result.get('response-size'),
-                parameters={
-                    'query': parsed_url.query,
-                    'form_data': result.get('form_data', {})
-                },
-                headers=result.get('headers', {}),
-                response_body=result.get('response', None),
-                source=source
-            )
-        except Exception as e:
-            self.logger.error(f"Error parsing result: {str(e)}")
-            raise
+            await self.flush()
+        except Exception:
+            # Already logged by flush(); the rows are retried on the next flush
+            pass
+
+    @staticmethod
+    def _subdomain_row(subdomain_data: dict) -> dict:
+        """Map scanner output onto Subdomain columns"""
+        columns = Subdomain.__table__.columns.keys()
+        row = {key: value for key, value in subdomain_data.items() if key in columns}
+
+        source = row.get('source')
+        if isinstance(source, str):
+            try:
+                row['source'] = SubdomainSource[source]
+            except KeyError:
+                row['source'] = SubdomainSource(source)
+
+        for key in ('discovery_time', 'last_checked'):
+            if isinstance(row.get(key), str):
+                row[key] = datetime.fromisoformat(row[key])
+
+        return row
+
 
-    def _deduplicate_results(self, results: List[KatanaResult]) -> List[KatanaResult]:
-        """Remove duplicate results based on URL and method"""
-        seen = set()
-        unique_results = []
-        
-        for result in results:
-            key = (result.url, result.method)
-            if key not in seen:
-                seen.add(key)
-                unique_results.append(result)
-        
-        return unique_results
\ No newline at end of file
+db_manager = DatabaseManager()
@@ -0,0 +1,197 @@
+import asyncio
+import socket
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiodns
+from aiohttp.abc import AbstractResolver
+
+from utils.rate_limit import RateLimiter
+
+# Answers that mean "this name/type has no records", cached for negative_ttl
+NEGATIVE_ERRORS = (aiodns.error.ARES_ENODATA, aiodns.error.ARES_ENOTFOUND)
+
+
+class DNSCache:
+    """
+    In-process DNS answer cache keyed by (name, rtype).
+
+    Positive answers live for their record TTL (clamped to [min_ttl, max_ttl]),
+    negative answers for negative_ttl. Once max_entries is reached the least
+    recently used entry is evicted.
+    """
+
+    def __init__(self, max_entries: int = 100_000, negative_ttl: float = 30,
+                 default_ttl: float = 300, min_ttl: float = 5, max_ttl: float = 3600):
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+
+    @staticmethod
+    def key(name: str, rtype: str) -> Tuple[str, str]:
+        return name.lower().rstrip('.'), rtype.upper()
+
+    def get(self, key: Tuple[str, str]) -> Tuple[bool, Any]:
+        """Return (found, value); value is the answer or the cached DNSError"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return False, None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    def set(self, key: Tuple[str, str], value: Any, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def answer_ttl(self, answer: Any) -> float:
+        """Smallest positive TTL among the answer records, clamped to the configured bounds"""
+        records = answer if isinstance(answer, list) else [answer]
+        ttls = [record.ttl for record in records if getattr(record, 'ttl', -1) > 0]
+        ttl = min(ttls) if ttls else self.default_ttl
+        return max(self.min_ttl, min(self.max_ttl, ttl))
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachingResolver:
+    """
+    aiodns front-end that answers repeated queries from a shared DNSCache.
+
+    Exposes the same ``query(name, rtype)`` coroutine as aiodns.DNSResolver,
+    so it can be dropped in wherever a resolver is used. Concurrent lookups of
+    the same (name, rtype) share a single upstream query. An optional
+    RateLimiter caps upstream queries per second; cache hits are never limited.
+    """
+
+    def __init__(self, resolver: Optional[aiodns.DNSResolver] = None,
+                 cache: Optional[DNSCache] = None, rate_limiter: Optional[RateLimiter] = None,
+                 **resolver_kwargs):
+        self._resolver = resolver
+        self.resolver_kwargs = resolver_kwargs
+        self.cache = cache or DNSCache()
+        self.rate_limiter = rate_limiter
+        self._in_flight: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    @property
+    def resolver(self) -> aiodns.DNSResolver:
+        # Created on first use so the c-ares channel binds to the running loop
+        if self._resolver is None:
+            self._resolver = aiodns.DNSResolver(**self.resolver_kwargs)
+        return self._resolver
+
+    async def query(self, name: str, rtype: str):
+        key = DNSCache.key(name, rtype)
+        found, value = self.cache.get(key)
+        if found:
+            if isinstance(value, Exception):
+                raise type(value)(*value.args)
+            return value
+
+        # The upstream lookup runs in its own task so one caller being cancelled
+        # doesn't cancel the lookup for everyone else waiting on it
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._lookup(key, name, rtype))
+            task.add_done_callback(_consume_exception)
+            self._in_flight[key] = task
+        return await asyncio.shield(task)
+
+    async def _lookup(self, key: Tuple[str, str], name: str, rtype: str):
+        try:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire()
+            answer = await self.resolver.query(name, rtype)
+        except aiodns.error.DNSError as e:
+            if e.args and e.args[0] in NEGATIVE_ERRORS:
+                self.cache.set(key, e, self.cache.negative_ttl)
+            raise
+        finally:
+            del self._in_flight[key]
+
+        self.cache.set(key, answer, self.cache.answer_ttl(answer))
+        return answer
+
+    async def resolve_addresses(self, name: str, family: int = socket.AF_UNSPEC) -> List[Tuple[int, str]]:
+        """Return (family, address) pairs for name from cached A/AAAA answers"""
+        addresses = []
+        lookups = []
+        if family in (socket.AF_INET, socket.AF_UNSPEC):
+            lookups.append((socket.AF_INET, 'A'))
+        if family in (socket.AF_INET6, socket.AF_UNSPEC):
+            lookups.append((socket.AF_INET6, 'AAAA'))
+
+        last_error = None
+        for address_family, rtype in lookups:
+            try:
+                answers = await self.query(name, rtype)
+            except aiodns.error.DNSError as e:
+                last_error = e
+                continue
+            addresses.extend((address_family, answer.host) for answer in answers)
+            if addresses and family == socket.AF_UNSPEC:
+                break
+
+        if not addresses and last_error is not None:
+            raise last_error
+        return addresses
+
+
+def _consume_exception(task: asyncio.Task):
+    # Avoid "exception was never retrieved" when every waiter was cancelled
+    if not task.cancelled():
+        task.exception()
+
+
+class AiohttpCacheResolver(AbstractResolver):
+    """Lets an aiohttp connector resolve hostnames through a CachingResolver"""
+
+    def __init__(self, resolver: CachingResolver, port_overrides: Optional[Dict[int, int]] = None):
+        """
+        Args:
+            resolver: CachingResolver answering the lookups
+            port_overrides: Ports to connect to instead of the requested ones, e.g. {80: 8080}
+        """
+        self.resolver = resolver
+        self.port_overrides = port_overrides or {}
+
+    async def resolve(self, host: str, port: int = 0,
+                      family: socket.AddressFamily = socket.AF_INET) -> List[Dict[str, Any]]:
+        try:
+            addresses = await self.resolver.resolve_addresses(host, family)
+        except aiodns.error.DNSError as exc:
+            msg = exc.args[1] if len(exc.args) > 1 else "DNS lookup failed"
+            raise OSError(None, msg) from exc
+
+        port = self.port_overrides.get(port, port)
+        return [
+            {
+                'hostname': host,
+                'host': address,
+                'port': port,
+                'family': address_family,
+                'proto': 0,
+                'flags': socket.AI_NUMERICHOST | socket.AI_NUMERICSERV,
+            }
+            for address_family, address in addresses
+        ]
+
+    async def close(self):
+        pass
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import aiohttp
+
+from utils.dns_cache import AiohttpCacheResolver, CachingResolver
+from utils.logging_config import get_component_logger
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+@dataclass
+class ProbeResult:
+    url: str
+    status: int
+    reason: Optional[str]
+    headers: Dict[str, str]
+    body_prefix: bytes = field(repr=False)
+    body_hash: str
+    truncated: bool
+    charset: Optional[str] = None
+
+    def text(self) -> str:
+        """Decode the body prefix; only done when a consumer actually needs text"""
+        return self.body_prefix.decode(self.charset or 'utf-8', errors='replace')
+
+    def summary(self) -> Dict:
+        """JSON-serialisable view stored alongside the subdomain"""
+        return {
+            'url': self.url,
+            'status': self.status,
+            'reason': self.reason,
+            'headers': self.headers,
+            'body_hash': self.body_hash,
+            'body_prefix_size': len(self.body_prefix),
+            'truncated': self.truncated,
+        }
+
+
+class HTTPProbeClient:
+    """
+    Pooled HTTP client owned by a scan and shared by all of its finders.
+
+    The underlying aiohttp session is created lazily on first use so that it
+    binds to the running event loop. Connections are pooled with explicit total
+    and per-host limits, kept alive between requests, and hostnames are
+    resolved through the scan's CachingResolver.
+    """
+
+    def __init__(self, resolver: Optional[CachingResolver] = None, limit: int = 200,
+                 limit_per_host: int = 4, keepalive_timeout: float = 30,
+                 timeout: float = 10, connect_timeout: float = 5,
+                 max_body_bytes: int = 16 * 1024, verify_ssl: bool = True,
+                 user_agent: str = DEFAULT_USER_AGENT, port_overrides: Optional[Dict[int, int]] = None):
+        """
+        Args:
+            resolver: CachingResolver used for hostname lookups
+            limit: Maximum open connections across all hosts
+            limit_per_host: Maximum open connections to a single host
+            keepalive_timeout: Seconds an idle connection stays pooled
+            timeout: Total seconds allowed per request
+            connect_timeout: Seconds allowed to establish a connection
+            max_body_bytes: Body prefix read by probe()
+            verify_ssl: Verify TLS certificates; disable to probe hosts with self-signed
+                        or mismatched certificates
+            user_agent: User-Agent header sent with every request
+            port_overrides: Ports connected to instead of the URL's, e.g. {80: 8080} to send
+                            probes to a local stand-in server; the Host header is unchanged
+        """
+        self.resolver = resolver or CachingResolver()
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=connect_timeout)
+        self.max_body_bytes = max_body_bytes
+        self.verify_ssl = verify_ssl
+        self.user_agent = user_agent
+        self.port_overrides = port_overrides
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = asyncio.Lock()
+        self.logger = get_component_logger('http_client')
+
+    async def session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it inside the running loop on first use"""
+        if self._session is not None and not self._session.closed:
+            return self._session
+
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    keepalive_timeout=self.keepalive_timeout,
+                    resolver=AiohttpCacheResolver(self.resolver, self.port_overrides),
+                    use_dns_cache=False,
+                    ssl=None if self.verify_ssl else False,
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=self.timeout,
+                    headers={'User-Agent': self.user_agent}
+                )
+                self.logger.debug(
+                    f"Created HTTP session (limit={self.limit}, limit_per_host={self.limit_per_host})"
+                )
+        return self._session
+
+    async def probe(self, url: str, max_body_bytes: Optional[int] = None) -> ProbeResult:
+        """
+        GET url without following redirects and read at most max_body_bytes of the body.
+
+        The prefix is kept as raw bytes and hashed; the rest of the body is never
+        downloaded, since leaving the response early drops the connection instead.
+
+        Raises:
+            aiohttp.ClientError, asyncio.TimeoutError: If the request fails
+        """
+        limit = self.max_body_bytes if max_body_bytes is None else max_body_bytes
+        session = await self.session()
+
+        async with session.get(url, allow_redirects=False) as response:
+            chunks = []
+            remaining = limit
+            while remaining > 0:
+                chunk = await response.content.read(remaining)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                remaining -= len(chunk)
+
+            body_prefix = b''.join(chunks)
+            truncated = remaining <= 0 and not response.content.at_eof()
+
+            return ProbeResult(
+                url=url,
+                status=response.status,
+                reason=response.reason,
+                headers=dict(response.headers),
+                body_prefix=body_prefix,
+                body_hash=hashlib.sha256(body_prefix).hexdigest()[:16],
+                truncated=truncated,
+                charset=response.charset,
+            )
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            self.logger.debug("Closed HTTP session")
+        self._session = None
@@ -1,29 +1,44 @@
+import atexit
 import logging
 import os
+import queue
 import sys
+import threading
+import time
+import uuid
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s,%(msecs)03d - %(name)s - %(levelname)s - %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Background thread writing records to the real handlers; set by setup_logging()
+_listener = None
+
 
 def setup_logging(log_level=logging.INFO):
-    """Setup application-wide logging configuration"""
+    """
+    Setup application-wide logging configuration
+
+    Loggers only put records on an in-memory queue; formatting and writing to
+    the console and log file happen on a background listener thread, so
+    logging never blocks the event loop on I/O. Calling it again replaces the
+    previous configuration.
+    """
+    global _listener
+    stop_logging()
+
     # Create logs directory if it doesn't exist
     log_dir = "logs"
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
 
-    # Configure root logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(log_level)
+    formatter = logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
 
-    # Console handler with color formatting
+    # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(log_level)
-    console_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S%f'
-    )
-    console_handler.setFormatter(console_formatter)
-    root_logger.addHandler(console_handler)
+    console_handler.setFormatter(formatter)
 
     # File handler with rotation
     log_file = os.path.join(log_dir, f"scanner_{datetime.now().strftime('%Y%m%d')}.log")
@@ -33,24 +48,115 @@ def setup_logging(log_level=logging.INFO):
         backupCount=5
     )
     file_handler.setLevel(log_level)
-    file_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S%f'
-    )
-    file_handler.setFormatter(file_formatter)
-    root_logger.addHandler(file_handler)
+    file_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    _listener.start()
+
+    # Configure root logger
+    root_logger = logging.getLogger()
+    root_logger.setLevel(log_level)
+    root_logger.handlers = [QueueHandler(log_queue)]
+
+
+def stop_logging():
+    """Write out queued records and stop the listener thread started by setup_logging()"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
 
 def get_logger(name):
     """Get a logger with the specified name"""
     return logging.getLogger(name)
 
-def get_component_logger(component_name, include_id=False):
-    """Get a logger for a specific component with optional ID inclusion"""
+
+def get_component_logger(component_name, include_id=False, instance_id=None):
+    """
+    Get a logger for a specific component with optional ID inclusion
+
+    Args:
+        component_name: Component part of the logger name
+        include_id: Append an instance ID; a random one is used when instance_id is not given
+        instance_id: ID of the object logging, e.g. its uuid; the first 8 characters are used
+    """
     logger_name = f"subdomain_scanner.{component_name}"
-    if include_id:
-        logger_name = f"{logger_name}.{id}"
+    if include_id and instance_id is None:
+        instance_id = uuid.uuid4()
+    if instance_id is not None:
+        logger_name = f"{logger_name}.{str(instance_id)[:8]}"
     return logging.getLogger(logger_name)
 
+
+class LogSampler:
+    """
+    Rate-limit a stream of similar log events per key.
+
+    The first ``burst`` events of each key in every ``interval`` are logged as
+    they come; the rest are only counted. The counts are logged as one summary
+    line once the interval is over, when the next event arrives, or on flush().
+    """
+
+    def __init__(self, logger, level=logging.INFO, burst=10, interval=30.0, label='events'):
+        """
+        Args:
+            logger: Logger the events and summaries are written to
+            level: Level of the events and summaries
+            burst: Events per key logged individually in each interval
+            interval: Seconds between summaries
+            label: What the summary calls the events, e.g. 'subdomains found'
+        """
+        self.logger = logger
+        self.level = level
+        self.burst = burst
+        self.interval = interval
+        self.label = label
+        self._window_start = time.monotonic()
+        self._logged = {}
+        self._suppressed = {}
+        self._lock = threading.Lock()
+
+    def log(self, message, key='', exc_info=False):
+        """Log message, or count it when key has used up its burst in this interval"""
+        if not self.logger.isEnabledFor(self.level):
+            return
+        with self._lock:
+            if time.monotonic() - self._window_start >= self.interval:
+                self._summarize()
+            logged = self._logged.get(key, 0)
+            if logged < self.burst:
+                self._logged[key] = logged + 1
+            else:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return
+        self.logger.log(self.level, message, exc_info=exc_info)
+
+    def flush(self):
+        """Log the counts suppressed so far"""
+        with self._lock:
+            self._summarize()
+
+    def _summarize(self):
+        if self._suppressed:
+            total = sum(self._suppressed.values())
+            elapsed = time.monotonic() - self._window_start
+            message = f"{total} more {self.label} in the last {elapsed:.0f}s not logged individually"
+            if any(self._suppressed):
+                counts = sorted(self._suppressed.items(), key=lambda item: -item[1])
+                message += ' (' + ', '.join(f"{key or 'other'}: {count}" for key, count in counts) + ')'
+            self.logger.log(self.level, message)
+        self._window_start = time.monotonic()
+        self._logged.clear()
+        self._suppressed.clear()
+
+
 # Configure logging levels for different components
 logging.getLogger('asyncio').setLevel(logging.WARNING)
 logging.getLogger('aiohttp').setLevel(logging.WARNING)
@@ -0,0 +1,311 @@
+import asyncio
+import bisect
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence
+
+from utils.logging_config import get_component_logger
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+PROMETHEUS_PREFIX = 'scanner'
+
+
+class Histogram:
+    """Latency histogram with fixed buckets, so memory stays constant however many samples arrive"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate of the q-quantile, interpolated linearly inside its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+    def merge(self, summary: Dict):
+        """Add the samples of another histogram's summary, taken with its bucket counts"""
+        counts = summary['buckets']
+        if len(counts) != len(self.counts):
+            raise ValueError("Cannot merge histograms with different buckets")
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, counts)]
+        self.count += summary['count']
+        self.sum += summary['sum']
+        self.max = max(self.max, summary['max'])
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'mean': round(self.sum / self.count, 6) if self.count else 0.0,
+            'p50': round(self.quantile(0.5), 6),
+            'p90': round(self.quantile(0.9), 6),
+            'p99': round(self.quantile(0.99), 6),
+            'max': round(self.max, 6),
+        }
+
+
+class Timing:
+    """Handle yielded by Metrics.timer() for leaving time spent on other work out of the stage"""
+
+    __slots__ = ('excluded',)
+
+    def __init__(self):
+        self.excluded = 0.0
+
+    def exclude(self, seconds: float):
+        self.excluded += seconds
+
+
+class Metrics:
+    """
+    Process-wide counters, gauges and per-stage latency histograms.
+
+    Stages are timed with ``timer()``, which also tracks how many calls of the
+    stage are in flight and counts the ones that raised. Gauges are either set
+    directly or computed when read from registered callables, e.g. queue
+    sizes, so hot paths never pay for them.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.gauges: Dict[str, float] = {}
+        self.stages: Dict[str, Histogram] = {}
+        self.in_flight: Dict[str, int] = defaultdict(int)
+        self._gauge_functions: Dict[str, List[Callable[[], float]]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def inc(self, name: str, value: float = 1):
+        self.counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def register_gauge(self, name: str, function: Callable[[], float]):
+        """Read function whenever the gauge is exported; several functions for one name are summed"""
+        with self._lock:
+            self._gauge_functions[name].append(function)
+
+    def unregister_gauge(self, name: str, function: Callable[[], float]):
+        with self._lock:
+            functions = self._gauge_functions.get(name, [])
+            if function in functions:
+                functions.remove(function)
+            if not functions:
+                self._gauge_functions.pop(name, None)
+
+    def observe(self, stage: str, seconds: float):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram(self.buckets)
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str):
+        """
+        Time the enclosed block as one call of stage; works around awaits too.
+
+        Yields a Timing whose excluded seconds, e.g. time the block spent
+        blocked on a later stage, are left out of the observed duration.
+        """
+        self.in_flight[stage] += 1
+        timing = Timing()
+        start = time.perf_counter()
+        try:
+            yield timing
+        except BaseException as e:
+            if not isinstance(e, (asyncio.CancelledError, GeneratorExit)):
+                self.counters[f'{stage}_errors'] += 1
+            raise
+        finally:
+            self.observe(stage, max(0.0, time.perf_counter() - start - timing.excluded))
+            self.in_flight[stage] -= 1
+
+    async def measure(self, stage: str, awaitable):
+        """Await awaitable as one timed call of stage and return its result"""
+        with self.timer(stage):
+            return await awaitable
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.stages.clear()
+            self.in_flight.clear()
+            self.started_at = time.time()
+
+    def current_gauges(self) -> Dict[str, float]:
+        gauges = dict(self.gauges)
+        with self._lock:
+            functions = {name: list(functions) for name, functions in self._gauge_functions.items()}
+        for name, name_functions in functions.items():
+            gauges[name] = sum(function() for function in name_functions)
+        return gauges
+
+    def snapshot(self, buckets: bool = False) -> Dict:
+        """
+        JSON-serialisable view of every metric.
+
+        Args:
+            buckets: Include each stage's raw bucket counts, which merge() needs
+        """
+        stages = {}
+        for stage, histogram in sorted(self.stages.items()):
+            stages[stage] = histogram.summary()
+            if buckets:
+                stages[stage]['buckets'] = list(histogram.counts)
+        return {
+            'uptime_seconds': round(time.time() - self.started_at, 3),
+            'counters': dict(sorted(self.counters.items())),
+            'gauges': dict(sorted(self.current_gauges().items())),
+            'in_flight': dict(sorted(self.in_flight.items())),
+            'stages': stages,
+        }
+
+    def merge(self, snapshot: Dict):
+        """
+        Add the counters and stage samples of another registry's snapshot(buckets=True).
+
+        Used to fold in what worker processes measured. Gauges and in-flight
+        counts describe the other process at one moment, so they are not merged.
+        """
+        for name, value in snapshot['counters'].items():
+            self.counters[name] += value
+        for stage, summary in snapshot['stages'].items():
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(self.buckets)
+            histogram.merge(summary)
+
+    def prometheus_text(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        prefix = PROMETHEUS_PREFIX
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines += [f'# TYPE {prefix}_{name}_total counter', f'{prefix}_{name}_total {value:g}']
+        for name, value in sorted(self.current_gauges().items()):
+            lines += [f'# TYPE {prefix}_{name} gauge', f'{prefix}_{name} {value:g}']
+
+        lines.append(f'# TYPE {prefix}_stage_in_flight gauge')
+        for stage, value in sorted(self.in_flight.items()):
+            lines.append(f'{prefix}_stage_in_flight{{stage="{stage}"}} {value}')
+
+        lines.append(f'# TYPE {prefix}_stage_duration_seconds histogram')
+        for stage, histogram in sorted(self.stages.items()):
+            cumulative = 0
+            for bound, count in zip(list(histogram.buckets) + [math.inf], histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound == math.inf else f'{bound:g}'
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def write_json(self, path: str):
+        """Atomically replace path with the current snapshot"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.snapshot(), f, indent=2)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+class MetricsExporter:
+    """
+    Publish a Metrics registry while a scan runs.
+
+    Serves the Prometheus text format on ``http://host:port/metrics`` and/or
+    rewrites a JSON snapshot file every ``interval`` seconds. Both are
+    optional; with neither configured start() does nothing.
+    """
+
+    def __init__(self, registry: Optional[Metrics] = None, port: Optional[int] = None,
+                 host: str = '127.0.0.1', path: Optional[str] = None, interval: float = 15.0):
+        """
+        Args:
+            registry: Metrics to publish (default: the process-wide registry)
+            port: Port of the Prometheus endpoint; no endpoint when None
+            host: Address the endpoint listens on
+            path: JSON file rewritten every interval and on close(); no file when None
+            interval: Seconds between file dumps
+        """
+        self.registry = registry or metrics
+        self.port = port
+        self.host = host
+        self.path = path
+        self.interval = interval
+        self._runner = None
+        self._dumper: Optional[asyncio.Task] = None
+        self.logger = get_component_logger('metrics')
+
+    async def start(self):
+        if self.port is not None:
+            from aiohttp import web
+
+            async def handle(request):
+                return web.Response(text=self.registry.prometheus_text(),
+                                    content_type='text/plain', charset='utf-8')
+
+            app = web.Application()
+            app.router.add_get('/metrics', handle)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, self.host, self.port).start()
+            self.logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+        if self.path is not None:
+            self._dumper = asyncio.create_task(self._dump_periodically())
+
+    async def close(self):
+        if self._dumper is not None:
+            self._dumper.cancel()
+            await asyncio.gather(self._dumper, return_exceptions=True)
+            self._dumper = None
+            self.registry.write_json(self.path)
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _dump_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.registry.write_json(self.path)
+            except OSError as e:
+                self.logger.warning(f"Could not write metrics to {self.path}: {str(e)}")
+
+
+# Global registry shared by every stage of the process
+metrics = Metrics()
@@ -0,0 +1,20 @@
+import asyncio
+from typing import Optional
+
+
+async def stop_process(process: asyncio.subprocess.Process, stderr_task: Optional[asyncio.Task] = None):
+    """
+    Release a subprocess whose output is being streamed, killing it if it still runs.
+
+    Args:
+        process: Process started with piped stdout (and optionally stderr)
+        stderr_task: Task draining stderr; cancelled when it has not finished
+    """
+    if stderr_task is not None and not stderr_task.done():
+        stderr_task.cancel()
+        await asyncio.gather(stderr_task, return_exceptions=True)
+    if process.returncode is None:
+        process.kill()
+        # Reading may be paused on a full buffer; communicate() drains the
+        # pipes so the process can exit, where wait() alone never returns
+        await process.communicate()
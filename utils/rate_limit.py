@@ -0,0 +1,45 @@
+import asyncio
+from typing import Optional
+
+
+class RateLimiter:
+    """Token bucket limiting how many operations may start per second"""
+
+    def __init__(self, rate: Optional[float], burst: Optional[int] = None):
+        """
+        Args:
+            rate: Operations allowed per second. None or 0 disables limiting.
+            burst: Maximum number of operations that may start back to back.
+                   Defaults to one second's worth of tokens.
+        """
+        self.rate = rate
+        self.burst = burst or max(1, int(rate or 1))
+        self._tokens = float(self.burst)
+        self._last = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and consume it"""
+        if not self.rate:
+            return
+
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            if self._last is not None:
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._last = loop.time()
+                self._tokens = 1
+
+            self._tokens -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
@@ -0,0 +1,105 @@
+import hashlib
+import math
+import os
+import sqlite3
+import tempfile
+from typing import Optional
+
+from utils.logging_config import get_component_logger
+
+
+class SeenSet:
+    """
+    Set of keys seen so far, with flat memory use however many keys are added.
+
+    Membership is answered by an in-memory Bloom filter first. A key the
+    filter has never seen is new for certain; only when the filter says
+    "maybe" is the exact set consulted. The exact set is a SQLite table of
+    16-byte key digests on disk, so false positives never drop a new key and
+    memory holds only the filter's bits (about 1.8 MB per million keys at the
+    default error rate).
+    """
+
+    def __init__(self, path: Optional[str] = None, capacity: int = 1_000_000,
+                 error_rate: float = 0.001, commit_every: int = 10_000):
+        """
+        Args:
+            path: SQLite file for the exact set; a temporary file removed on close when None
+            capacity: Keys the Bloom filter is sized for; past it false positives rise,
+                      which only costs extra lookups in the exact set
+            error_rate: Target Bloom filter false positive rate at capacity
+            commit_every: Inserts between commits of the exact set
+        """
+        self.bit_count = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.bit_count / capacity * math.log(2)))
+        self._bits = bytearray((self.bit_count + 7) // 8)
+        self.commit_every = commit_every
+        self._pending_commits = 0
+        self.count = 0
+        self.exact_lookups = 0
+
+        self._temporary = path is None
+        if self._temporary:
+            fd, path = tempfile.mkstemp(prefix='seen-', suffix='.sqlite3')
+            os.close(fd)
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=OFF')
+        self._db.execute('CREATE TABLE IF NOT EXISTS seen (digest BLOB PRIMARY KEY) WITHOUT ROWID')
+
+        # Keys persisted by an earlier run have to be in the filter too
+        for (digest,) in self._db.execute('SELECT digest FROM seen'):
+            self._set_bits(digest)
+            self.count += 1
+        self.logger = get_component_logger('seen_set')
+
+    def add(self, key: str) -> bool:
+        """Record key; True if it was not seen before"""
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+        if self._maybe_contains(digest):
+            self.exact_lookups += 1
+            if self._db.execute('SELECT 1 FROM seen WHERE digest = ?', (digest,)).fetchone():
+                return False
+
+        self._set_bits(digest)
+        self._db.execute('INSERT OR IGNORE INTO seen (digest) VALUES (?)', (digest,))
+        self.count += 1
+        self._pending_commits += 1
+        if self._pending_commits >= self.commit_every:
+            self._db.commit()
+            self._pending_commits = 0
+        return True
+
+    def __contains__(self, key: str) -> bool:
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        if not self._maybe_contains(digest):
+            return False
+        return self._db.execute('SELECT 1 FROM seen WHERE digest = ?', (digest,)).fetchone() is not None
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
+        if self._temporary:
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.unlink(self.path + suffix)
+                except FileNotFoundError:
+                    pass
+
+    def _positions(self, digest: bytes):
+        # Double hashing: two 64-bit halves of the digest generate every probe
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.bit_count for i in range(self.hash_count))
+
+    def _maybe_contains(self, digest: bytes) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+    def _set_bits(self, digest: bytes):
+        for position in self._positions(digest):
+            self._bits[position >> 3] |= 1 << (position & 7)
@@ -0,0 +1,61 @@
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Path segments and query values that identify a record rather than a route
+TEMPLATES = (
+    (re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE), '{uuid}'),
+    (re.compile(r'^\d+$'), '{int}'),
+    (re.compile(r'^[0-9a-f]{16,}$', re.IGNORECASE), '{hex}'),
+)
+
+_PERCENT_ESCAPE = re.compile(r'%[0-9a-fA-F]{2}')
+_REPEATED_SLASHES = re.compile(r'/{2,}')
+
+
+def template_value(value: str) -> str:
+    """Replace an ID-like value with its placeholder, leaving anything else untouched"""
+    for pattern, placeholder in TEMPLATES:
+        if pattern.match(value):
+            return placeholder
+    return value
+
+
+def normalize_url(url: str, template: bool = False, keep_query: bool = True) -> str:
+    """
+    Canonical form of url for deduplication.
+
+    Lowercases the scheme and host, drops default ports, fragments, repeated
+    and trailing slashes, sorts query parameters and uppercases percent
+    escapes. With template, numeric, UUID and long hex path segments and query
+    values become placeholders, so /users/1 and /users/2 are one route.
+    Without keep_query the query string is dropped altogether.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+
+    host = (parts.hostname or '').rstrip('.')
+    if ':' in host:
+        # hostname strips an IPv6 literal's brackets, which the netloc needs back
+        host = f'[{host}]'
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or port == DEFAULT_PORTS.get(scheme) else f'{host}:{port}'
+
+    path = _PERCENT_ESCAPE.sub(lambda match: match.group(0).upper(), parts.path)
+    path = _REPEATED_SLASHES.sub('/', path)
+    if len(path) > 1:
+        path = path.rstrip('/')
+    if template:
+        path = '/'.join(template_value(segment) for segment in path.split('/'))
+    path = path or '/'
+
+    params = parse_qsl(parts.query, keep_blank_values=True) if keep_query else []
+    if template:
+        params = [(key, template_value(value)) for key, value in params]
+    query = urlencode(sorted(params), safe='{}')
+
+    return urlunsplit((scheme, netloc, path, query, ''))